@@ -0,0 +1,237 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from main import (
+    CHECKSUM_ALGORITHMS,
+    CHECKSUM_MODES,
+    FILL_MODES,
+    checksum,
+    fill,
+    padding_blocks,
+    write_gzip,
+)
+
+
+def size_to_bytes(size_str):
+    units = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30}
+    match = re.fullmatch(r"(\d+)([KMG]?)", size_str)
+    if not match:
+        raise ValueError(f"Invalid size: {size_str}")
+    return int(match.group(1)) * units[match.group(2)]
+
+
+def bench_fill(args):
+    print(f"{'size':>8} {'mode':>10} {'mean (s)':>12} {'stdev (s)':>12} {'MB/s':>10}")
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmpdir:
+        path = os.path.join(tmpdir, "fill.bin")
+        for size_str in args.sizes:
+            size = size_to_bytes(size_str)
+            for mode in args.modes:
+                times = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    with open(path, "wb") as fd:
+                        fill(fd, size, mode, args.block_size)
+                        if args.fsync:
+                            fd.flush()
+                            os.fsync(fd.fileno())
+                    times.append(time.perf_counter() - start)
+                    if os.path.getsize(path) != size:
+                        raise Exception(
+                            f"Fill mode {mode} wrote {os.path.getsize(path)} bytes instead of {size}"
+                        )
+                    os.remove(path)
+                mean = statistics.mean(times)
+                stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+                print(
+                    f"{size_str:>8} {mode:>10} {mean:>12.6f} {stdev:>12.6f} "
+                    f"{size / mean / 10**6 if mean > 0 else float('inf'):>10.1f}"
+                )
+
+
+def bench_checksum(args):
+    print(
+        f"{'size':>8} {'algorithm':>10} {'mode':>10} {'mean (s)':>12} "
+        f"{'stdev (s)':>12} {'GB/s':>8}"
+    )
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmpdir:
+        path = os.path.join(tmpdir, "checksum.bin")
+        for size_str in args.sizes:
+            size = size_to_bytes(size_str)
+            with open(path, "wb") as fd:
+                fill(fd, size, "random")
+            for algorithm in args.algorithms:
+                digests = set()
+                for mode in args.modes:
+                    times = []
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        digests.add(checksum(path, algorithm, mode, args.chunk_size))
+                        times.append(time.perf_counter() - start)
+                    mean = statistics.mean(times)
+                    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+                    print(
+                        f"{size_str:>8} {algorithm:>10} {mode:>10} {mean:>12.6f} "
+                        f"{stdev:>12.6f} "
+                        f"{size / mean / 10**9 if mean > 0 else float('inf'):>8.3f}"
+                    )
+                if len(digests) != 1:
+                    raise Exception(
+                        f"Checksum modes disagree on {size_str} with {algorithm}"
+                    )
+            os.remove(path)
+
+
+def bench_gzip(args):
+    print(
+        f"{'size':>8} {'fill':>8} {'workers':>8} {'mean (s)':>12} "
+        f"{'stdev (s)':>12} {'MB/s':>10} {'ratio':>8}"
+    )
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmpdir:
+        path = os.path.join(tmpdir, "output.gz")
+        for size_str in args.sizes:
+            size = size_to_bytes(size_str)
+            for fill_mode in args.fills:
+                for workers in args.workers:
+                    times = []
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        with open(path, "wb") as fd:
+                            write_gzip(
+                                fd,
+                                padding_blocks(size, fill_mode),
+                                args.level,
+                                args.block_size,
+                                workers,
+                            )
+                        times.append(time.perf_counter() - start)
+                    mean = statistics.mean(times)
+                    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+                    print(
+                        f"{size_str:>8} {fill_mode:>8} {workers:>8} {mean:>12.6f} "
+                        f"{stdev:>12.6f} "
+                        f"{size / mean / 10**6 if mean > 0 else float('inf'):>10.1f} "
+                        f"{size / os.path.getsize(path):>8.1f}"
+                    )
+                    os.remove(path)
+
+
+def bench_daemon(args):
+    # Whole jobs as launched by the workflow: the dummyfailure command run
+    # in-process, and the same command forwarded to a warm daemon
+    directory = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(directory, "client.py")]
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmpdir:
+        with open(os.path.join(tmpdir, "input.txt"), "w") as fd:
+            fd.write("dummy input\n")
+        job = ["sifting", "input.txt", "1"]
+        env = {k: v for k, v in os.environ.items() if k != "DUMMYFAILURE_DAEMON_SOCKET"}
+        socket_path = os.path.join(tmpdir, "dummyfailure.sock")
+        daemon = subprocess.Popen(
+            [*command, "daemon", "--socket", socket_path],
+            cwd=tmpdir,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            while not os.path.exists(socket_path):
+                if daemon.poll() is not None:
+                    raise Exception("The dummyfailure daemon did not start")
+                time.sleep(0.05)
+            print(f"{'mode':>10} {'mean (s)':>12} {'stdev (s)':>12}")
+            means = {}
+            for mode, job_env in (
+                ("in-process", env),
+                ("daemon", {**env, "DUMMYFAILURE_DAEMON_SOCKET": socket_path}),
+            ):
+                times = []
+                for _ in range(args.jobs):
+                    start = time.perf_counter()
+                    subprocess.run(
+                        [*command, *job],
+                        cwd=tmpdir,
+                        env=job_env,
+                        stdout=subprocess.DEVNULL,
+                        check=True,
+                    )
+                    times.append(time.perf_counter() - start)
+                means[mode] = statistics.mean(times)
+                stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+                print(f"{mode:>10} {means[mode]:>12.6f} {stdev:>12.6f}")
+        finally:
+            daemon.terminate()
+            daemon.wait()
+    if means["daemon"] >= means["in-process"]:
+        raise Exception("Daemon jobs are not faster than in-process jobs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks for dummyfailure")
+    parser.add_argument(
+        "--workdir", default=None, help="Directory for the temporary files"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    # fill
+    fill_parser = subparsers.add_parser("fill", help="Compare the fill engines")
+    fill_parser.add_argument(
+        "--sizes", nargs="+", default=["1K", "1M", "16M", "200M"], type=str
+    )
+    fill_parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=[m for m in FILL_MODES if m != "legacy"],
+        choices=FILL_MODES,
+    )
+    fill_parser.add_argument("--block-size", type=int, default=2**20)
+    fill_parser.add_argument("--fsync", action="store_true")
+    fill_parser.set_defaults(func=bench_fill)
+
+    # checksum
+    checksum_parser = subparsers.add_parser(
+        "checksum", help="Compare the checksum backends"
+    )
+    checksum_parser.add_argument(
+        "--sizes", nargs="+", default=["1K", "1M", "100M", "1G"], type=str
+    )
+    checksum_parser.add_argument(
+        "--algorithms",
+        nargs="+",
+        default=list(CHECKSUM_ALGORITHMS),
+        choices=CHECKSUM_ALGORITHMS,
+    )
+    checksum_parser.add_argument(
+        "--modes", nargs="+", default=list(CHECKSUM_MODES), choices=CHECKSUM_MODES
+    )
+    checksum_parser.add_argument("--chunk-size", type=int, default=2**20)
+    checksum_parser.set_defaults(func=bench_checksum)
+
+    # gzip
+    gzip_parser = subparsers.add_parser(
+        "gzip", help="Measure the block-parallel gzip writer"
+    )
+    gzip_parser.add_argument("--sizes", nargs="+", default=["1M", "16M", "200M"])
+    gzip_parser.add_argument(
+        "--fills", nargs="+", default=["block", "random"], choices=FILL_MODES
+    )
+    gzip_parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    gzip_parser.add_argument("--level", type=int, default=6)
+    gzip_parser.add_argument("--block-size", type=int, default=2**17)
+    gzip_parser.set_defaults(func=bench_gzip)
+
+    # daemon
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Compare in-process and daemon-forwarded jobs"
+    )
+    daemon_parser.add_argument("--jobs", type=int, default=20)
+    daemon_parser.set_defaults(func=bench_daemon)
+
+    args = parser.parse_args()
+    args.func(args)
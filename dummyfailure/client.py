@@ -0,0 +1,65 @@
+import json
+import os
+import socket
+import struct
+import sys
+
+# Entry point of the dummyfailure command. Only the modules needed to reach
+# the daemon are imported here: main.py, with NumPy and the other heavy
+# dependencies, is only loaded when the job runs in-process
+
+
+def recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        if not (chunk := sock.recv(size - len(data))):
+            raise ConnectionError("Connection closed before the end of the message")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def forward(socket_path, argv):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        if os.environ.get("DUMMYFAILURE_DAEMON_AUTOSTART", "0") == "1":
+            import subprocess
+
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(sys.argv[0]), "daemon"],
+                cwd="/",
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        return None
+    with client:
+        payload = json.dumps(
+            {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+        ).encode()
+        socket.send_fds(client, [struct.pack("!I", len(payload))], [0, 1, 2])
+        client.sendall(payload)
+        (exit_code,) = struct.unpack("!i", recv_exactly(client, 4))
+    # Mirror the shell convention for processes terminated by a signal
+    return 128 - exit_code if exit_code < 0 else exit_code
+
+
+def try_forward(argv):
+    # When a daemon socket is configured, forward the invocation to the daemon.
+    # None means that the job must run in-process
+    if "daemon" in argv or not (
+        socket_path := os.environ.get("DUMMYFAILURE_DAEMON_SOCKET")
+    ):
+        return None
+    return forward(socket_path, argv)
+
+
+if __name__ == "__main__":
+    if (exit_code := try_forward(sys.argv[1:])) is not None:
+        sys.exit(exit_code)
+    from main import cli
+
+    cli()
@@ -1,73 +1,1478 @@
 import argparse
+import array
+import collections
+import contextlib
+import errno
+import fcntl
+import functools
+import gzip
 import hashlib
+import json
+import mmap
 import os
 import random
+import resource
+import selectors
 import shutil
+import signal
+import socket
+import sqlite3
+import struct
+import sys
+import tarfile
+import threading
 import time
-from pathlib import Path, PurePath
+import traceback
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+from client import recv_exactly, try_forward
 
-def checksum(path):
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+CHECKSUM_ALGORITHMS = ("sha1", "blake2b", "sha256")
+CHECKSUM_MODES = ("read", "readinto", "mmap")
+COLUMNS_FILE = "columns.txt"
+DAEMON_SOCKET = "/tmp/dummyfailure.sock"
+FAILURE_KINDS = ("crash_before_write", "truncate", "corrupt", "workdir_wipe", "hang")
+FICLONE = 0x40049409
+FILL_MODES = ("legacy", "block", "sparse", "fallocate", "random")
+MERGE_METHODS = ("auto", "copy_file_range", "sendfile", "readinto")
+OUTPUT_FORMATS = ("plain", "tar.gz")
+VCF_INDEX_HEADER = "<8sQQQ"
+VCF_INDEX_HEADER_SIZE = struct.calcsize(VCF_INDEX_HEADER)
+VCF_INDEX_MAGIC = b"DFVCFIDX"
+VCF_INDEX_STRIDE = 1024
+WORK_MODES = ("dummy", "real")
+
+
+class ChecksumCache:
+    def __init__(self, path, max_entries=10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_bytes = 0
+        self._lock = threading.Lock()
+        # Autocommit mode: writes open explicit IMMEDIATE transactions so that
+        # concurrent jobs sharing the cache serialize on the database lock
+        self._connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        try:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError:
+            pass
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            "device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, "
+            "algorithm TEXT, digest TEXT NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (device, inode, size, mtime_ns, algorithm))"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS digests_last_used ON digests (last_used)"
+        )
+
+    def close(self):
+        self._connection.close()
+
+    def get(self, path, algorithm, compute):
+        stat = os.stat(path)
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, algorithm)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT digest FROM digests WHERE device = ? AND inode = ? "
+                "AND size = ? AND mtime_ns = ? AND algorithm = ?",
+                key,
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.saved_bytes += stat.st_size
+                self._connection.execute(
+                    "UPDATE digests SET last_used = ? WHERE device = ? AND inode = ? "
+                    "AND size = ? AND mtime_ns = ? AND algorithm = ?",
+                    (time.time(), *key),
+                )
+                return row[0]
+        digest = compute()
+        with self._lock:
+            self.misses += 1
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*key, digest, time.time()),
+                )
+                self._connection.execute(
+                    "DELETE FROM digests WHERE rowid IN (SELECT rowid FROM digests "
+                    "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return digest
+
+
+class Throttle:
+    def __init__(self, rate, latency=0.0, jitter=0.0, burst=2**20):
+        # Token bucket in bytes: consumers may drive it into debt and then
+        # sleep until it is repaid, so no lock is held while waiting
+        self.rate = rate
+        self.latency = latency
+        self.jitter = jitter
+        self.burst = burst
+        self._tokens = burst
+        self._timestamp = time.monotonic()
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def consume(self, size):
+        with self._lock:
+            delay = max(
+                0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)
+            )
+            if self.rate > 0:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._timestamp) * self.rate
+                )
+                self._timestamp = now
+                self._tokens -= size
+                if self._tokens < 0:
+                    delay += -self._tokens / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ThrottledWriter:
+    def __init__(self, fd, throttle):
+        self._fd = fd
+        self._throttle = throttle
+
+    def __getattr__(self, name):
+        return getattr(self._fd, name)
+
+    def write(self, data):
+        size = self._fd.write(data)
+        self._throttle.consume(size)
+        return size
+
+    def consume(self, size):
+        self._throttle.consume(size)
+
+
+def make_throttle(rate, latency, jitter):
+    # Rates are in MB/s, latency and jitter in milliseconds
+    if rate <= 0 and latency <= 0 and jitter <= 0:
+        return None
+    return Throttle(rate * 10**6, latency / 1000, jitter / 1000)
+
+
+def checksum(
+    path, algorithm="sha1", mode="readinto", chunk_size=2**20, cache=None, throttle=None
+):
     if not Path(path).is_file():
         raise Exception(f"File {path} does not exist.")
+    if cache is not None:
+        return cache.get(
+            path,
+            algorithm,
+            functools.partial(
+                checksum, path, algorithm, mode, chunk_size, throttle=throttle
+            ),
+        )
+    digest = hashlib.new(algorithm, usedforsecurity=False)
     with open(path, "rb") as f:
-        sha1_checksum = hashlib.new("sha1", usedforsecurity=False)
-        while data := f.read(2**16):
-            sha1_checksum.update(data)
-        return sha1_checksum.hexdigest()
+        if mode == "read":
+            while data := f.read(chunk_size):
+                if throttle is not None:
+                    throttle.consume(len(data))
+                digest.update(data)
+        elif mode == "readinto":
+            buffer = bytearray(max(1, min(chunk_size, os.fstat(f.fileno()).st_size)))
+            with memoryview(buffer) as view:
+                while size := f.readinto(buffer):
+                    if throttle is not None:
+                        throttle.consume(size)
+                    digest.update(view[:size])
+        elif mode == "mmap":
+            # Empty files cannot be mapped, but their digest is the initial one
+            if os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mmap, "MADV_SEQUENTIAL"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    with memoryview(mm) as view:
+                        for offset in range(0, len(view), chunk_size):
+                            if throttle is not None:
+                                throttle.consume(min(chunk_size, len(view) - offset))
+                            digest.update(view[offset : offset + chunk_size])
+        else:
+            raise ValueError(f"Unknown checksum mode: {mode}")
+    return digest.hexdigest()
 
 
-def main(args):
+def checksums(paths, workers=1, **kwargs):
+    # Results keep the input order and the first failing path (in input
+    # order) raises, so the outcome is the same as the serial loop
+    if workers <= 1 or len(paths) <= 1:
+        return [checksum(path, **kwargs) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return list(executor.map(functools.partial(checksum, **kwargs), paths))
+
+
+def available_cpus():
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fd:
+            quota, period = fd.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as fd:
+            quota = int(fd.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as fd:
+            period = int(fd.read())
+        if quota > 0:
+            return max(1, int(quota / period))
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0))
+
+
+def fill(fd, length, mode="block", block_size=2**20):
+    if length <= 0:
+        return
+    if mode == "legacy":
+        # Original byte-at-a-time padding, kept as a baseline for benchmarks
+        for _ in range(length):
+            fd.write(b"0")
+    elif mode == "block":
+        block = memoryview(b"0" * min(block_size, length))
+        while length > 0:
+            length -= fd.write(block[: min(length, len(block))])
+    elif mode == "random":
+        while length > 0:
+            length -= fd.write(os.urandom(min(length, block_size)))
+    elif mode in ("sparse", "fallocate"):
+        fd.flush()
+        offset = fd.tell()
+        if mode == "fallocate":
+            try:
+                os.posix_fallocate(fd.fileno(), offset, length)
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+                print(f"Warning: fallocate not supported, using sparse padding: {e}")
+                os.ftruncate(fd.fileno(), offset + length)
+        else:
+            os.ftruncate(fd.fileno(), offset + length)
+        fd.seek(offset + length)
+        # No data goes through the writer: charge the logical size instead
+        if isinstance(fd, ThrottledWriter):
+            fd.consume(length)
+    else:
+        raise ValueError(f"Unknown fill mode: {mode}")
+
+
+def padding_blocks(length, mode="block", block_size=2**20):
+    # In-memory counterpart of fill() for the archive writer: sparse and
+    # fallocate padding are NUL bytes once read back
+    if mode == "random":
+        while length > 0:
+            yield os.urandom(min(length, block_size))
+            length -= block_size
+    elif mode in FILL_MODES:
+        block = (b"0" if mode in ("legacy", "block") else b"\0") * block_size
+        while length > 0:
+            yield block[: min(length, block_size)]
+            length -= block_size
+    else:
+        raise ValueError(f"Unknown fill mode: {mode}")
+
+
+def _tar_stream(name, content, size, fill_mode, fill_block_size):
+    info = tarfile.TarInfo(name)
+    info.size = max(len(content), int(size))
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    yield info.tobuf(format=tarfile.USTAR_FORMAT)
+    yield content
+    yield from padding_blocks(info.size - len(content), fill_mode, fill_block_size)
+    # Member padding, end-of-archive marker and record padding, as tarfile does
+    trailer = -info.size % tarfile.BLOCKSIZE + 2 * tarfile.BLOCKSIZE
+    trailer += -(tarfile.BLOCKSIZE + info.size + trailer) % tarfile.RECORDSIZE
+    yield b"\0" * trailer
+
+
+def _rechunk(pieces, size):
+    # Yield (block, is_last) pairs of exactly size bytes, except the last one
+    buffer, previous = bytearray(), None
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= size:
+            if previous is not None:
+                yield previous, False
+            previous, buffer = bytes(buffer[:size]), buffer[size:]
+    if buffer:
+        if previous is not None:
+            yield previous, False
+        previous = bytes(buffer)
+    if previous is not None:
+        yield previous, True
+
+
+def _deflate_block(data, dictionary, last, level):
+    # Every block is compressed independently, primed with the tail of the
+    # previous one as pigz does, and sync-flushed to a byte boundary so that
+    # the raw deflate segments concatenate into a single stream
+    compressor = (
+        zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+        if dictionary
+        else zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    )
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+def write_gzip(fd, pieces, level=6, block_size=2**17, workers=1):
+    fd.write(b"\x1f\x8b\x08\x00" + struct.pack("<I", int(time.time())) + b"\x00\x03")
+    crc, length, dictionary = 0, 0, b""
+    in_flight = collections.deque()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for block, last in _rechunk(pieces, block_size):
+            in_flight.append(
+                executor.submit(_deflate_block, block, dictionary, last, level)
+            )
+            dictionary = block[-(2**15) :]
+            crc = zlib.crc32(block, crc)
+            length += len(block)
+            # Bound memory to a couple of blocks per worker
+            while len(in_flight) > 2 * workers:
+                fd.write(in_flight.popleft().result())
+        while in_flight:
+            fd.write(in_flight.popleft().result())
+    if length == 0:
+        fd.write(zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS).flush())
+    fd.write(struct.pack("<II", crc, length & 0xFFFFFFFF))
+
+
+def write_tar_gz(fd, name, content, size, args):
+    write_gzip(
+        fd,
+        _tar_stream(name, content, size, args.fill, args.fill_block_size),
+        args.gzip_level,
+        args.gzip_block_size,
+        args.gzip_workers,
+    )
+
+
+class Telemetry:
+    def __init__(self, args):
+        self.record = {
+            "context": args.context,
+            "chromosome": getattr(args, "chromosome", None),
+            "population": getattr(args, "population", None),
+            "counter": getattr(args, "counter", None),
+            "stop": getattr(args, "stop", None),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "cwd": os.getcwd(),
+            "start": time.time(),
+            "phases": {},
+            "bytes_read": 0,
+            "bytes_written": 0,
+        }
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            phase = self.record["phases"].setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            phase["wall"] += time.perf_counter() - wall
+            phase["cpu"] += time.process_time() - cpu
+
+    def emit(self, destination, status):
+        self.record["status"] = status
+        self.record["wall"] = time.perf_counter() - self._wall
+        self.record["cpu"] = time.process_time() - self._cpu
+        self.record["peak_rss"] = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        )
+        if psutil is not None:
+            try:
+                self.record["io_counters"] = psutil.Process().io_counters()._asdict()
+            except (psutil.Error, AttributeError, NotImplementedError):
+                pass
+        line = json.dumps(self.record) + "\n"
+        if destination == "-":
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            # A single append write keeps records from concurrent jobs intact
+            fd = os.open(destination, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+
+
+def _vcf_index_candidates(path, index_dir):
+    realpath = os.path.realpath(path)
+    yield f"{realpath}.dfidx"
+    if index_dir is not None:
+        key = hashlib.sha1(realpath.encode(), usedforsecurity=False).hexdigest()
+        yield os.path.join(index_dir, f"{os.path.basename(realpath)}.{key}.dfidx")
+
+
+def build_vcf_index(path, stride=VCF_INDEX_STRIDE):
+    # Byte offset of every stride-th data line (1-based: 1, stride + 1, ...)
+    offsets = array.array("Q")
+    offset, lineno = 0, 0
+    with open(path, "rb", buffering=2**20) as f:
+        for line in f:
+            if not line.startswith(b"#"):
+                if lineno % stride == 0:
+                    offsets.append(offset)
+                lineno += 1
+            offset += len(line)
+    return offsets
+
+
+def _read_vcf_index(candidates, header):
+    for candidate in candidates:
+        try:
+            with open(candidate, "rb") as fd:
+                if (
+                    struct.unpack(VCF_INDEX_HEADER, fd.read(VCF_INDEX_HEADER_SIZE))
+                    == header
+                ):
+                    offsets = array.array("Q")
+                    offsets.frombytes(fd.read())
+                    return offsets
+        except (OSError, struct.error):
+            pass
+    return None
+
+
+def load_vcf_index(path, index_dir=None, stride=VCF_INDEX_STRIDE):
+    if path.endswith(".gz"):
+        return None
+    stat = os.stat(path)
+    header = (VCF_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, stride)
+    candidates = list(_vcf_index_candidates(path, index_dir))
+    if (offsets := _read_vcf_index(candidates, header)) is not None:
+        return offsets
+    # Concurrent shards start together: the first one to take the lock builds
+    # the index, the others wait for it and read it
+    lock_fd = None
+    for candidate in candidates:
+        try:
+            lock_fd = os.open(f"{candidate}.lock", os.O_CREAT | os.O_RDWR, 0o644)
+            break
+        except OSError:
+            pass
+    try:
+        if lock_fd is not None:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            if (offsets := _read_vcf_index(candidates, header)) is not None:
+                return offsets
+        offsets = build_vcf_index(path, stride)
+        for candidate in candidates:
+            # The rename never exposes partial files to unlocked readers
+            tmp_path = f"{candidate}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "wb") as fd:
+                    fd.write(struct.pack(VCF_INDEX_HEADER, *header))
+                    offsets.tofile(fd)
+                os.replace(tmp_path, candidate)
+                break
+            except OSError:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+        else:
+            print(f"Warning: cannot store the VCF index of {path}")
+        return offsets
+    finally:
+        if lock_fd is not None:
+            os.close(lock_fd)
+
+
+def read_vcf_shard(path, offsets, counter, stop, stride=VCF_INDEX_STRIDE):
+    # Yield data lines counter..stop (1-based, inclusive), seeking to the
+    # nearest indexed line when an index is available
+    if counter > stop:
+        return
+    if offsets is None:
+        f, lineno = gzip.open(path, "rb"), 1
+    elif (checkpoint := (counter - 1) // stride) < len(offsets):
+        f, lineno = open(path, "rb", buffering=2**20), checkpoint * stride + 1
+        f.seek(offsets[checkpoint])
+    else:
+        return
+    with f:
+        for line in f:
+            if line.startswith(b"#"):
+                continue
+            if lineno >= counter:
+                yield line
+            if lineno >= stop:
+                break
+            lineno += 1
+
+
+def load_individuals(population):
+    # The staged columns.txt holds the VCF header columns, samples start at
+    # the 10th one, while population files list one sample per line
+    for path in (COLUMNS_FILE, population):
+        if not Path(path).is_file():
+            raise Exception(f"File {path} does not exist.")
+    with open(COLUMNS_FILE) as fd:
+        samples = fd.read().split()[9:]
+    with open(population) as fd:
+        members = set(fd.read().split())
+    if not (indices := [i for i, sample in enumerate(samples) if sample in members]):
+        print(f"Warning: no sample of {population} in {COLUMNS_FILE}, using all")
+        indices = list(range(len(samples)))
+    return len(samples), np.asarray(indices)
+
+
+def _parse_genotypes(rows):
+    # GT-only fields are fixed width ("0|1\t"), so alleles sit at offsets 0
+    # and 2 of every 4 bytes and the whole chunk is decoded in one step
+    gts = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), -1, 4)
+    return gts[:, :, [0, 2]] != ord("0")
+
+
+def genotype_chunks(path, n_samples, seed, variants, chunk_size):
+    with open(path, "rb") as f:
+        head = f.read(2**16)
+    if any(line.count(b"\t") >= 9 for line in head.splitlines()[:-1]):
+        rows = []
+        with open(path, "rb", buffering=2**20) as f:
+            for line in f:
+                if line.startswith(b"#"):
+                    continue
+                fields = line.rstrip(b"\n").split(b"\t", 9)
+                if len(fields) == 10 and len(fields[9]) == 4 * n_samples - 1:
+                    rows.append(fields[9] + b"\t")
+                    if len(rows) == chunk_size:
+                        yield _parse_genotypes(rows)
+                        rows = []
+        if rows:
+            yield _parse_genotypes(rows)
+    else:
+        # Dummy inputs carry no genotypes: synthesize them from the input
+        # digest, skewed towards rare alleles as in the real data
+        rng = np.random.default_rng(seed)
+        for start in range(0, variants, chunk_size):
+            size = min(chunk_size, variants - start)
+            frequencies = rng.beta(0.5, 10, size=(size, 1, 1)).astype(np.float32)
+            yield rng.random((size, n_samples, 2), dtype=np.float32) < frequencies
+
+
+def load_sift_mask(path, seed, variants):
+    # Real sifted files start each line with the variant number, dummy ones
+    # only hold a digest: then a deterministic ~5% of variants is selected
+    if not Path(path).is_file():
+        raise Exception(f"File {path} does not exist.")
+    selected = []
+    with open(path, "rb") as f:
+        for line in f:
+            if (fields := line.split(maxsplit=1)) and fields[0].isdigit():
+                selected.append(int(fields[0]) - 1)
+            elif len(line) > 2**16:
+                break
+    if selected:
+        mask = np.zeros(max(max(selected) + 1, variants), dtype=bool)
+        mask[selected] = True
+        return mask
+    return np.random.default_rng(seed + 1).random(variants) < 0.05
+
+
+def compute(
+    context, path, population, sift_file, seed, variants, chunk_size, intensity
+):
+    if np is None:
+        raise Exception("NumPy is required by the real work mode")
+    n_samples, indices = load_individuals(population)
+    if context == "frequency":
+        edges = np.linspace(0, 1, 21)
+        histogram = np.zeros(len(edges) - 1, dtype=np.int64)
+        for chunk in genotype_chunks(path, n_samples, seed, variants, chunk_size):
+            for _ in range(intensity):
+                counts = chunk[:, indices, :].sum(axis=(1, 2))
+                frequencies = counts / (2 * len(indices))
+                histogram += np.histogram(frequencies, bins=edges)[0]
+        return {
+            "population": population,
+            "histogram": (histogram // intensity).tolist(),
+        }
+    else:
+        sift = load_sift_mask(sift_file, seed, variants)
+        overlap = np.zeros((len(indices), len(indices)), dtype=np.float64)
+        start = 0
+        for chunk in genotype_chunks(path, n_samples, seed, variants, chunk_size):
+            selected = np.zeros(len(chunk), dtype=bool)
+            window = sift[start : start + len(chunk)]
+            selected[: len(window)] = window
+            start += len(chunk)
+            for _ in range(intensity):
+                mutated = chunk[selected][:, indices, :].any(axis=2)
+                mutated = mutated.astype(np.float32)
+                overlap += mutated.T @ mutated
+        overlap /= intensity
+        mutations = np.diag(overlap)
+        pairs = overlap[np.triu_indices(len(indices), k=1)]
+        return {
+            "population": population,
+            "sift_variants": int(sift[:start].sum()),
+            "mean_mutations": float(mutations.mean()) if len(mutations) else 0.0,
+            "mean_overlap": float(pairs.mean()) if len(pairs) else 0.0,
+            "max_overlap": float(pairs.max()) if len(pairs) else 0.0,
+        }
+
+
+class OutputStore:
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, **params):
+        return hashlib.sha256(
+            json.dumps(params, sort_keys=True).encode(), usedforsecurity=False
+        ).hexdigest()
+
+    def _object(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def fetch(self, key, dest):
+        obj = self._object(key)
+        try:
+            os.link(obj, dest)
+            method = "hardlink"
+        except FileExistsError:
+            os.remove(dest)
+            return self.fetch(key, dest)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            # Different filesystem: try a reflink, then a plain copy
+            try:
+                with open(obj, "rb") as src, open(dest, "wb") as dst:
+                    try:
+                        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                        method = "reflink"
+                    except OSError:
+                        shutil.copyfileobj(src, dst, 2**20)
+                        method = "copy"
+            except FileNotFoundError:
+                return None
+        # Touch the object to keep it in the least recently used order
+        with contextlib.suppress(OSError):
+            os.utime(obj)
+        return method
+
+    def put(self, key, src):
+        obj = self._object(key)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        tmp_path = f"{obj}.{socket.gethostname()}.{os.getpid()}.tmp"
+        try:
+            os.link(src, tmp_path)
+        except OSError:
+            shutil.copyfile(src, tmp_path)
+        # The rename is atomic, concurrent writers of the same key just
+        # replace each other's identical object
+        os.replace(tmp_path, obj)
+        self.evict()
+
+    def evict(self):
+        with open(os.path.join(self.path, ".lock"), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            objects = []
+            for entry in os.scandir(self.path):
+                if entry.is_dir(follow_symlinks=False):
+                    for obj in os.scandir(entry.path):
+                        if not obj.name.endswith(".tmp"):
+                            with contextlib.suppress(FileNotFoundError):
+                                stat = obj.stat(follow_symlinks=False)
+                                objects.append((stat.st_mtime, stat.st_size, obj.path))
+            total = sum(size for _, size, _ in objects)
+            for _, size, path in sorted(objects):
+                if total <= self.max_bytes:
+                    break
+                # Job directories keep their hard links, so removing an
+                # object never breaks an output already restored from it
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                total -= size
+
+
+def _copy_range(src, dst, size, method, throttles=()):
+    # Returns the number of bytes copied before the method gave up, so the
+    # caller can continue with the next fallback from the current offsets
+    copied = 0
+    try:
+        while copied < size:
+            # Throttled copies go in small steps to follow the configured rate
+            count = min(size - copied, 2**20) if throttles else size - copied
+            if method == "copy_file_range":
+                n = os.copy_file_range(src, dst, count)
+            else:
+                n = os.sendfile(dst, src, None, count)
+            if n == 0:
+                break
+            for throttle in throttles:
+                throttle.consume(n)
+            copied += n
+    except OSError as e:
+        if e.errno not in (
+            errno.EXDEV,
+            errno.ENOSYS,
+            errno.EINVAL,
+            errno.EOPNOTSUPP,
+            errno.EBADF,
+        ):
+            raise
+    return copied
+
+
+def merge_files(
+    paths, fd, method="auto", algorithm=None, chunk_size=2**20, throttles=()
+):
+    # Concatenate paths into fd with kernel-side copies, falling back to a
+    # buffered copy, which is also the single pass used to hash the inputs
+    if algorithm is not None:
+        method = "readinto"
+    if method == "auto":
+        methods = MERGE_METHODS[1:]
+    else:
+        methods = tuple(dict.fromkeys((method, "readinto")))
+    buffer = bytearray(chunk_size)
+    used, digests = set(), []
+    with memoryview(buffer) as view:
+        for path in paths:
+            with open(path, "rb") as f:
+                remaining = os.fstat(f.fileno()).st_size
+                for candidate in methods:
+                    # Empty inputs are still hashed, one digest per input
+                    if remaining == 0 and algorithm is None:
+                        break
+                    elif candidate == "readinto":
+                        digest = (
+                            hashlib.new(algorithm, usedforsecurity=False)
+                            if algorithm
+                            else None
+                        )
+                        while size := f.readinto(buffer):
+                            if digest is not None:
+                                digest.update(view[:size])
+                            fd.write(view[:size])
+                            for throttle in throttles:
+                                throttle.consume(size)
+                        if digest is not None:
+                            digests.append(digest.hexdigest())
+                        remaining = 0
+                    elif copied := _copy_range(
+                        f.fileno(), fd.fileno(), remaining, candidate, throttles
+                    ):
+                        remaining -= copied
+                    else:
+                        continue
+                    used.add(candidate)
+    return ", ".join(sorted(used)) or "none", digests
+
+
+def load_profile(path):
+    with open(path) as fd:
+        if path.endswith((".yml", ".yaml")):
+            if yaml is None:
+                raise Exception("PyYAML is required to load YAML failure profiles")
+            return yaml.safe_load(fd) or {}
+        return json.load(fd)
+
+
+def sample_delay(rng, spec):
+    if spec is None:
+        return 0.0
+    elif isinstance(spec, (int, float)):
+        return float(spec)
+    distribution = spec.get("distribution", "constant")
+    if distribution == "constant":
+        return float(spec["value"])
+    elif distribution == "uniform":
+        return rng.uniform(spec.get("min", 0), spec["max"])
+    elif distribution == "exponential":
+        return rng.expovariate(1 / spec["mean"])
+    elif distribution == "normal":
+        return max(0.0, rng.gauss(spec["mean"], spec.get("stddev", 0)))
+    elif distribution == "choice":
+        return float(rng.choice(spec["values"]))
+    else:
+        raise ValueError(f"Unknown delay distribution: {distribution}")
+
+
+class FailureInjector:
+    def __init__(self, profile, context):
+        settings = {
+            **profile.get("default", {}),
+            **profile.get("contexts", {}).get(context, {}),
+        }
+        self.context = context
+        if not (
+            0
+            <= (
+                failure_probability := float(
+                    settings.get(
+                        "probability", os.environ.get("DUMMYFAILURE_PROBABILITY", 0)
+                    )
+                )
+            )
+            <= 1
+        ):
+            raise ValueError(
+                f"Failure probability must be between 0 and 1. Got: {failure_probability}"
+            )
+        self.probability = failure_probability
+        self.kinds = settings.get("kinds", {"workdir_wipe": 1})
+        if unknown := set(self.kinds) - set(FAILURE_KINDS):
+            raise ValueError(f"Unknown failure kinds: {', '.join(sorted(unknown))}")
+        # Same distribution as the original coin-flip 2 seconds sleep
+        self.delay = settings.get("delay", {"distribution": "choice", "values": [0, 2]})
+        self.hang_timeout = float(settings.get("hang_timeout", 60))
+        self.silent = bool(settings.get("silent", False))
+        self.seed = os.environ.get("DUMMYFAILURE_SEED", profile.get("seed"))
+        self.state_file = os.environ.get(
+            "DUMMYFAILURE_STATE_FILE", profile.get("state_file")
+        )
+        if self.seed is not None and self.state_file is None:
+            # A retry may run in another container, a local default would
+            # restart its attempts from 0
+            raise ValueError(
+                "A seeded failure profile requires a state_file "
+                "(env: DUMMYFAILURE_STATE_FILE) on storage shared by all the "
+                "deployments"
+            )
+
+    def _next_attempt(self, key):
+        # Re-executions of the same job must not replay the same decision,
+        # so attempts are counted in a state file shared by all the jobs
+        if not os.path.isdir(os.path.dirname(os.path.abspath(self.state_file))):
+            raise FileNotFoundError(
+                f"Directory of the failure state file {self.state_file} not found: "
+                "is the shared volume mounted in this deployment?"
+            )
+        with open(self.state_file, "a+") as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            fd.seek(0)
+            attempts = json.loads(content) if (content := fd.read()) else {}
+            attempt = attempts.get(key, 0)
+            attempts[key] = attempt + 1
+            fd.seek(0)
+            fd.truncate()
+            json.dump(attempts, fd)
+        return attempt
+
+    def schedule(self, args):
+        if self.seed is None:
+            rng, attempt = random.Random(), None
+        else:
+            key = "|".join(
+                str(v)
+                for v in (
+                    self.seed,
+                    self.context,
+                    getattr(args, "chromosome", None),
+                    getattr(args, "counter", None),
+                    getattr(args, "population", None),
+                )
+            )
+            attempt = self._next_attempt(key)
+            digest = hashlib.sha256(f"{key}|{attempt}".encode()).digest()
+            rng = random.Random(int.from_bytes(digest[:8], "big"))
+        if rng.random() >= self.probability:
+            return None
+        return {
+            "kind": rng.choices(list(self.kinds), weights=list(self.kinds.values()))[0],
+            "delay": sample_delay(rng, self.delay),
+            "attempt": attempt,
+            "hang_timeout": self.hang_timeout,
+            "silent": self.silent,
+            "rng": rng,
+        }
+
+
+def inject_failure(failure, out_name, telemetry):
+    kind, rng = failure["kind"], failure["rng"]
+    telemetry.record["injected_failure"] = kind
+    telemetry.record["failure_attempt"] = failure["attempt"]
+    if failure["delay"] > 0:
+        with telemetry.phase("failure_delay"):
+            time.sleep(failure["delay"])
+    if kind in ("truncate", "corrupt") and os.stat(out_name).st_nlink > 1:
+        # Never damage an output shared with the output store
+        shutil.copyfile(out_name, f"{out_name}.tmp")
+        os.replace(f"{out_name}.tmp", out_name)
+    if kind == "truncate":
+        size = int(os.path.getsize(out_name) * rng.random())
+        print(f"Output {out_name} will be truncated to {size} bytes")
+        os.truncate(out_name, size)
+    elif kind == "corrupt":
+        print(f"Output {out_name} will be corrupted")
+        with open(out_name, "r+b") as fd:
+            if size := os.fstat(fd.fileno()).st_size:
+                for offset in sorted(rng.randrange(size) for _ in range(16)):
+                    fd.seek(offset)
+                    byte = fd.read(1)[0]
+                    fd.seek(offset)
+                    fd.write(bytes([byte ^ 0xFF]))
+    elif kind == "workdir_wipe":
+        print(f"Workdir will be deleted: {os.path.dirname(os.getcwd())}")
+        with telemetry.phase("workdir_delete"):
+            shutil.rmtree(os.path.dirname(os.getcwd()))
+    elif kind == "hang":
+        print(f"Job will hang for {failure['hang_timeout']} seconds")
+        with telemetry.phase("hang"):
+            time.sleep(failure["hang_timeout"])
+    if failure["silent"] and kind in ("truncate", "corrupt"):
+        return
+    raise Exception(f"Dummy failure raised an exception ({kind})")
+
+
+def execute(args, telemetry):
+    read_throttle = make_throttle(args.io_read_rate, args.io_latency, args.io_jitter)
+    write_throttle = make_throttle(args.io_write_rate, args.io_latency, args.io_jitter)
+    checksum_options = {
+        "throttle": read_throttle,
+        "algorithm": args.checksum_algorithm,
+        "mode": args.checksum_mode,
+        "chunk_size": args.checksum_chunk_size,
+        "cache": (
+            ChecksumCache(args.checksum_cache, args.checksum_cache_size)
+            if args.checksum_cache
+            else None
+        ),
+    }
     if args.context == "individuals":
-        content = checksum(args.input_file)
+        inputs = [args.input_file]
         out_name = f"chr{args.chromosome}n-{args.counter}-{args.stop}.tar.gz"
         size = 200 * 1024 * 1024
     elif args.context == "individuals_merge":
-        content = "\n".join(checksum(filepath) for filepath in args.input_files)
+        inputs = args.input_files
         out_name = f"chr{args.chromosome}n.tar.gz"
         size = 200 * 1024 * 1024
     elif args.context == "sifting":
-        content = checksum(args.input_file)
+        inputs = [args.input_file]
         out_name = f"sifted.SIFT.chr{args.chromosome}.txt"
         size = 1.6 * 1024 * 1024
     elif args.context == "frequency":
-        content = checksum(f"chr{args.chromosome}n.tar.gz")
+        inputs = [f"chr{args.chromosome}n.tar.gz"]
         out_name = f"chr{args.chromosome}-{args.population}-freq.tar.gz"
         size = 1 * 1024 * 1024
     elif args.context == "mutation_overlap":
-        content = checksum(f"chr{args.chromosome}n.tar.gz")
+        inputs = [f"chr{args.chromosome}n.tar.gz"]
         out_name = f"chr{args.chromosome}-{args.population}.tar.gz"
         size = 200 * 1024
     else:
         raise ValueError(f"Unknown context: {args.context}")
-    if PurePath(out_name).stem == "tar.gz":
-        mode_ = "wb"
+    if args.work == "real" and args.context == "individuals":
+        if not Path(args.input_file).is_file():
+            raise Exception(f"File {args.input_file} does not exist.")
+        with telemetry.phase("index"):
+            offsets = load_vcf_index(args.input_file, args.vcf_index_dir)
+        with telemetry.phase("checksum"):
+            digest = hashlib.new(args.checksum_algorithm, usedforsecurity=False)
+            for line in read_vcf_shard(
+                args.input_file, offsets, args.counter, args.stop
+            ):
+                if read_throttle is not None:
+                    read_throttle.consume(len(line))
+                digest.update(line)
+                telemetry.record["bytes_read"] += len(line)
+            content = digest.hexdigest()
+    elif args.work == "real" and args.context == "individuals_merge":
+        # Inputs are hashed, if at all, while they are merged
+        for path in inputs:
+            if not Path(path).is_file():
+                raise Exception(f"File {path} does not exist.")
+        content = None
+    else:
+        with telemetry.phase("checksum"):
+            content = "\n".join(
+                checksums(inputs, args.checksum_workers, **checksum_options)
+            )
+        telemetry.record["bytes_read"] += sum(os.path.getsize(p) for p in inputs)
+    if args.work == "real" and args.context in ("frequency", "mutation_overlap"):
+        with telemetry.phase("compute"):
+            result = compute(
+                args.context,
+                inputs[0],
+                args.population,
+                f"sifted.SIFT.chr{args.chromosome}.txt",
+                seed=int(content[:16], 16),
+                variants=args.compute_variants,
+                chunk_size=args.compute_chunk_size,
+                intensity=args.compute_intensity,
+            )
+        content = f"{content}\n{json.dumps(result)}\n"
+    failure = FailureInjector(
+        load_profile(args.failure_profile) if args.failure_profile else {},
+        args.context,
+    ).schedule(args)
+    if failure is not None and failure["kind"] == "crash_before_write":
+        inject_failure(failure, out_name, telemetry)
+    store, linked = None, None
+    if args.output_store:
+        store = OutputStore(args.output_store, args.output_store_size)
+        key = store.key(
+            context=args.context,
+            out_name=out_name,
+            size=size,
+            work=args.work,
+            # Merges read their inputs only once: they are keyed on the file
+            # identity, as in the checksum cache, instead of being hashed first
+            content=(
+                content
+                if content is not None
+                else [
+                    (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                    for stat in map(os.stat, inputs)
+                ]
+            ),
+            fill=args.fill,
+            fill_block_size=args.fill_block_size,
+            output_format=args.output_format,
+            gzip_level=args.gzip_level,
+            gzip_block_size=args.gzip_block_size,
+        )
+        with telemetry.phase("store"):
+            linked = store.fetch(key, out_name)
+        telemetry.record["output_store"] = "miss" if linked is None else linked
+        if linked is None:
+            # A stale output may still be linked to a store object
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(out_name)
+    if linked is not None:
+        print(f"Output {out_name} restored from the output store ({linked})")
+    elif content is None:
+        with telemetry.phase("merge"):
+            with open(out_name, "wb", buffering=0) as fd:
+                start = time.perf_counter()
+                method, digests = merge_files(
+                    inputs,
+                    fd,
+                    args.merge_method,
+                    args.checksum_algorithm if args.merge_hash else None,
+                    args.checksum_chunk_size,
+                    tuple(t for t in (read_throttle, write_throttle) if t is not None),
+                )
+                elapsed = time.perf_counter() - start
+                telemetry.record["bytes_read"] += fd.tell()
+                telemetry.record["bytes_written"] += fd.tell()
+                print(
+                    f"Merged {len(inputs)} files ({fd.tell()} bytes) into {out_name} "
+                    f"in {elapsed:.3f} seconds "
+                    f"({fd.tell() / max(elapsed, 1e-9) / 10**6:.1f} MB/s) "
+                    f"using {method}"
+                )
+                telemetry.record["merge"] = {"method": method, "digests": digests}
+                for path, digest in zip(inputs, digests):
+                    print(f"{digest}  {path}")
     else:
-        mode_ = "w"
-    with open(out_name, mode_) as fd:
-        fd.write(content)
-        for _ in range(int(size - fd.tell())):
-            fd.write("0")
-
-    if not (
-        0
-        <= (failure_probability := float(os.environ.get("DUMMYFAILURE_PROBABILITY", 0)))
-        <= 1
-    ):
-        raise ValueError(
-            f"Failure probability must be between 0 and 1. Got: {failure_probability}"
+        with telemetry.phase("write"):
+            with open(out_name, "wb") as fd:
+                if write_throttle is not None:
+                    fd = ThrottledWriter(fd, write_throttle)
+                if args.output_format == "tar.gz" and out_name.endswith(".tar.gz"):
+                    write_tar_gz(
+                        fd, out_name[: -len(".tar.gz")], content.encode(), size, args
+                    )
+                else:
+                    fd.write(content.encode())
+                    fill(fd, int(size - fd.tell()), args.fill, args.fill_block_size)
+                telemetry.record["bytes_written"] += fd.tell()
+    if store is not None and linked is None:
+        with telemetry.phase("store"):
+            store.put(key, out_name)
+    if (cache := checksum_options["cache"]) is not None:
+        print(
+            f"Checksum cache: {cache.hits} hits, {cache.misses} misses, "
+            f"{cache.saved_bytes} bytes not hashed"
         )
+        telemetry.record["checksum_cache"] = {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "saved_bytes": cache.saved_bytes,
+        }
+        cache.close()
 
-    if random.random() < failure_probability:
-        if random.random() < 0.5:
-            time.sleep(2)
-        print(f"Workdir will be deleted: {os.path.dirname(os.getcwd())}")
-        shutil.rmtree(os.path.dirname(os.getcwd()))
-        raise Exception("Dummy failure raised an exception")
+    if failure is not None:
+        inject_failure(failure, out_name, telemetry)
 
 
-if __name__ == "__main__":
+def main(args):
+    telemetry = Telemetry(args)
+    status = "failed"
+    try:
+        execute(args, telemetry)
+        status = "completed"
+    finally:
+        if args.telemetry:
+            telemetry.emit(args.telemetry, status)
+
+
+def _exit_code(code):
+    if code is None:
+        return 0
+    elif isinstance(code, int):
+        return code
+    else:
+        print(code, file=sys.stderr)
+        return 1
+
+
+def _run_request(conn, request, fds):
+    # Executed in a forked child: it takes over the client's stdio, working
+    # directory and environment, so main() behaves as in a standalone process
+    exit_code = 1
+    try:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, signal.SIG_DFL)
+        conn.close()
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.argv = [sys.argv[0], *request["argv"]]
+        try:
+            main(build_parser().parse_args(request["argv"]))
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = _exit_code(e.code)
+        except BaseException:
+            traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def serve(socket_path, workers, idle_timeout=0):
+    lock_fd = os.open(f"{socket_path}.lock", os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print(f"A dummyfailure daemon is already serving {socket_path}")
+        os.close(lock_fd)
+        return
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(128)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    pending = collections.deque()
+    running = {}
+    last_activity = time.monotonic()
+    print(f"Serving dummyfailure on {socket_path} with {workers} workers")
+    sys.stdout.flush()
+    try:
+        while True:
+            for key, _ in selector.select(timeout=1):
+                if key.fileobj is server:
+                    conn, _ = server.accept()
+                    try:
+                        conn.settimeout(10)
+                        msg, fds, _, _ = socket.recv_fds(conn, 4, 3)
+                        if len(msg) < 4:
+                            msg += recv_exactly(conn, 4 - len(msg))
+                        (length,) = struct.unpack("!I", msg)
+                        request = json.loads(recv_exactly(conn, length))
+                        pending.append((conn, request, fds))
+                    except (OSError, ValueError) as e:
+                        print(f"Discarding malformed request: {e}", file=sys.stderr)
+                        conn.close()
+                elif key.data is not None:
+                    # The child exited, or the client closed the connection
+                    pid, conn, pidfd = key.data
+                    if pid not in running:
+                        continue
+                    if key.fileobj is conn:
+                        os.kill(pid, signal.SIGKILL)
+                    _, status = os.waitpid(pid, 0)
+                    selector.unregister(conn)
+                    selector.unregister(pidfd)
+                    os.close(pidfd)
+                    del running[pid]
+                    try:
+                        conn.sendall(
+                            struct.pack("!i", os.waitstatus_to_exitcode(status))
+                        )
+                    except OSError:
+                        pass
+                    conn.close()
+            while pending and len(running) < workers:
+                conn, request, fds = pending.popleft()
+                sys.stdout.flush()
+                sys.stderr.flush()
+                if (pid := os.fork()) == 0:
+                    selector.close()
+                    server.close()
+                    for _, other_conn, other_pidfd in running.values():
+                        other_conn.close()
+                        os.close(other_pidfd)
+                    for other_conn, _, other_fds in pending:
+                        other_conn.close()
+                        for fd in other_fds:
+                            os.close(fd)
+                    _run_request(conn, request, fds)
+                for fd in fds:
+                    os.close(fd)
+                pidfd = os.pidfd_open(pid)
+                running[pid] = (pid, conn, pidfd)
+                selector.register(pidfd, selectors.EVENT_READ, running[pid])
+                selector.register(conn, selectors.EVENT_READ, running[pid])
+            if pending or running:
+                last_activity = time.monotonic()
+            elif idle_timeout and time.monotonic() - last_activity > idle_timeout:
+                print(f"Idle for {idle_timeout} seconds, exiting")
+                break
+    finally:
+        selector.close()
+        server.close()
+        os.unlink(socket_path)
+        os.close(lock_fd)
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description="")
+    parser.add_argument(
+        "--fill",
+        choices=FILL_MODES,
+        default=os.environ.get("DUMMYFAILURE_FILL", "block"),
+        help="Padding engine for the output files (env: DUMMYFAILURE_FILL). "
+        "'legacy' and 'block' write '0' characters, 'sparse' and 'fallocate' "
+        "write NUL bytes, 'random' writes incompressible data",
+    )
+    parser.add_argument(
+        "--fill-block-size",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_FILL_BLOCK_SIZE", 2**20)),
+        help="Block size in bytes for the 'block' and 'random' fill engines "
+        "(env: DUMMYFAILURE_FILL_BLOCK_SIZE)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default=os.environ.get("DUMMYFAILURE_OUTPUT_FORMAT", "plain"),
+        help="'tar.gz' writes .tar.gz outputs as real gzip-compressed tar "
+        "archives holding the padded content (env: DUMMYFAILURE_OUTPUT_FORMAT)",
+    )
+    parser.add_argument(
+        "--output-store",
+        default=os.environ.get("DUMMYFAILURE_OUTPUT_STORE"),
+        help="Local directory of a content-addressed store: outputs are keyed by "
+        "context, parameters and input digests and re-executions link them "
+        "instead of writing them again (env: DUMMYFAILURE_OUTPUT_STORE, "
+        "default: disabled)",
+    )
+    parser.add_argument(
+        "--output-store-size",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_OUTPUT_STORE_SIZE", 20 * 2**30)),
+        help="Maximum size in bytes of the output store, least recently used "
+        "outputs are evicted first (env: DUMMYFAILURE_OUTPUT_STORE_SIZE)",
+    )
+    parser.add_argument(
+        "--gzip-level",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_GZIP_LEVEL", 6)),
+        help="Compression level of tar.gz outputs (env: DUMMYFAILURE_GZIP_LEVEL)",
+    )
+    parser.add_argument(
+        "--gzip-block-size",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_GZIP_BLOCK_SIZE", 2**17)),
+        help="Size in bytes of the blocks compressed in parallel "
+        "(env: DUMMYFAILURE_GZIP_BLOCK_SIZE)",
+    )
+    parser.add_argument(
+        "--gzip-workers",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_GZIP_WORKERS", 0)) or available_cpus(),
+        help="Number of threads compressing tar.gz outputs "
+        "(env: DUMMYFAILURE_GZIP_WORKERS, default: available CPUs)",
+    )
+    parser.add_argument(
+        "--io-read-rate",
+        type=float,
+        default=float(os.environ.get("DUMMYFAILURE_IO_READ_RATE", 0)),
+        help="Emulated read bandwidth in MB/s for checksums and merges, 0 means "
+        "unlimited (env: DUMMYFAILURE_IO_READ_RATE)",
+    )
+    parser.add_argument(
+        "--io-write-rate",
+        type=float,
+        default=float(os.environ.get("DUMMYFAILURE_IO_WRITE_RATE", 0)),
+        help="Emulated write bandwidth in MB/s for outputs, 0 means unlimited. "
+        "Sparse and fallocate fills are charged their logical size "
+        "(env: DUMMYFAILURE_IO_WRITE_RATE)",
+    )
+    parser.add_argument(
+        "--io-latency",
+        type=float,
+        default=float(os.environ.get("DUMMYFAILURE_IO_LATENCY", 0)),
+        help="Emulated latency in milliseconds added to every throttled I/O "
+        "operation (env: DUMMYFAILURE_IO_LATENCY)",
+    )
+    parser.add_argument(
+        "--io-jitter",
+        type=float,
+        default=float(os.environ.get("DUMMYFAILURE_IO_JITTER", 0)),
+        help="Uniform jitter in milliseconds applied to the emulated latency "
+        "(env: DUMMYFAILURE_IO_JITTER)",
+    )
+    parser.add_argument(
+        "--checksum-workers",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_CHECKSUM_WORKERS", 0))
+        or available_cpus(),
+        help="Number of threads used to checksum multiple input files "
+        "(env: DUMMYFAILURE_CHECKSUM_WORKERS, default: available CPUs)",
+    )
+    parser.add_argument(
+        "--checksum-algorithm",
+        choices=CHECKSUM_ALGORITHMS,
+        default=os.environ.get("DUMMYFAILURE_CHECKSUM_ALGORITHM", "sha1"),
+        help="Hash algorithm used to checksum the input files "
+        "(env: DUMMYFAILURE_CHECKSUM_ALGORITHM)",
+    )
+    parser.add_argument(
+        "--checksum-mode",
+        choices=CHECKSUM_MODES,
+        default=os.environ.get("DUMMYFAILURE_CHECKSUM_MODE", "readinto"),
+        help="How input files are read while hashing: 'read' copies each chunk, "
+        "'readinto' reuses a preallocated buffer, 'mmap' hashes the mapped file "
+        "without copies (env: DUMMYFAILURE_CHECKSUM_MODE)",
+    )
+    parser.add_argument(
+        "--checksum-chunk-size",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_CHECKSUM_CHUNK_SIZE", 2**20)),
+        help="Chunk size in bytes fed to the hash function "
+        "(env: DUMMYFAILURE_CHECKSUM_CHUNK_SIZE)",
+    )
+    parser.add_argument(
+        "--checksum-cache",
+        default=os.environ.get("DUMMYFAILURE_CHECKSUM_CACHE"),
+        help="SQLite file caching digests by (device, inode, size, mtime_ns) "
+        "across invocations. It must live outside the job workdir and on a "
+        "local filesystem (env: DUMMYFAILURE_CHECKSUM_CACHE, default: disabled)",
+    )
+    parser.add_argument(
+        "--checksum-cache-size",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_CHECKSUM_CACHE_SIZE", 10000)),
+        help="Maximum number of cached digests, least recently used are evicted "
+        "first (env: DUMMYFAILURE_CHECKSUM_CACHE_SIZE)",
+    )
+    parser.add_argument(
+        "--telemetry",
+        default=os.environ.get("DUMMYFAILURE_TELEMETRY"),
+        help="Append a JSON record with per-phase timings and resource usage to "
+        "this file, or write it to stderr with '-'. The file should live outside "
+        "the job workdir (env: DUMMYFAILURE_TELEMETRY, default: disabled)",
+    )
+    parser.add_argument(
+        "--failure-profile",
+        default=os.environ.get("DUMMYFAILURE_PROFILE"),
+        help="JSON or YAML failure injection profile with per-context "
+        "probabilities, delays and failure kinds (env: DUMMYFAILURE_PROFILE). "
+        "Without it, DUMMYFAILURE_PROBABILITY drives a workdir wipe",
+    )
+    parser.add_argument(
+        "--work",
+        choices=WORK_MODES,
+        default=os.environ.get("DUMMYFAILURE_WORK", "dummy"),
+        help="'dummy' hashes whole input files, 'real' models the work of the "
+        "original steps: individuals only streams its shard of the VCF, "
+        "individuals_merge concatenates its inputs, frequency and "
+        "mutation_overlap run NumPy kernels over the genotypes "
+        "(env: DUMMYFAILURE_WORK)",
+    )
+    parser.add_argument(
+        "--compute-variants",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_COMPUTE_VARIANTS", 250000)),
+        help="Number of synthetic variants processed by frequency and "
+        "mutation_overlap in real mode when the input holds no genotypes "
+        "(env: DUMMYFAILURE_COMPUTE_VARIANTS)",
+    )
+    parser.add_argument(
+        "--compute-chunk-size",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_COMPUTE_CHUNK_SIZE", 1024)),
+        help="Variants processed per vectorized batch, bounding memory usage "
+        "(env: DUMMYFAILURE_COMPUTE_CHUNK_SIZE)",
+    )
+    parser.add_argument(
+        "--compute-intensity",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_COMPUTE_INTENSITY", 1)),
+        help="How many times the compute kernels run on each batch "
+        "(env: DUMMYFAILURE_COMPUTE_INTENSITY)",
+    )
+    parser.add_argument(
+        "--merge-method",
+        choices=MERGE_METHODS,
+        default=os.environ.get("DUMMYFAILURE_MERGE_METHOD", "auto"),
+        help="How individuals_merge copies its inputs in real mode: 'auto' tries "
+        "copy_file_range, then sendfile, then buffered readinto "
+        "(env: DUMMYFAILURE_MERGE_METHOD)",
+    )
+    parser.add_argument(
+        "--merge-hash",
+        action="store_true",
+        default=os.environ.get("DUMMYFAILURE_MERGE_HASH", "0") == "1",
+        help="Hash the inputs of individuals_merge while copying them, reading "
+        "each input once (env: DUMMYFAILURE_MERGE_HASH=1)",
+    )
+    parser.add_argument(
+        "--vcf-index-dir",
+        default=os.environ.get("DUMMYFAILURE_VCF_INDEX_DIR"),
+        help="Fallback directory for VCF line indexes when they cannot be "
+        "stored next to the VCF file (env: DUMMYFAILURE_VCF_INDEX_DIR)",
+    )
     subparsers = parser.add_subparsers(dest="context")
 
     # individuals
@@ -98,4 +1503,45 @@ if __name__ == "__main__":
     mutation_overlap_parser.add_argument("-c", "--chromosome", type=int)
     mutation_overlap_parser.add_argument("-pop", "--population", type=str)
 
-    main(parser.parse_args())
+    # daemon
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Serve the other subcommands over a Unix socket"
+    )
+    daemon_parser.add_argument(
+        "--socket",
+        default=os.environ.get("DUMMYFAILURE_DAEMON_SOCKET", DAEMON_SOCKET),
+        help="Path of the Unix socket (env: DUMMYFAILURE_DAEMON_SOCKET)",
+    )
+    daemon_parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("DUMMYFAILURE_DAEMON_WORKERS", 0))
+        or available_cpus(),
+        help="Maximum number of concurrent requests "
+        "(env: DUMMYFAILURE_DAEMON_WORKERS, default: available CPUs)",
+    )
+    daemon_parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=float(os.environ.get("DUMMYFAILURE_DAEMON_IDLE_TIMEOUT", 0)),
+        help="Exit after this many seconds without requests, 0 means never "
+        "(env: DUMMYFAILURE_DAEMON_IDLE_TIMEOUT)",
+    )
+
+    return parser
+
+
+def cli():
+    args = build_parser().parse_args()
+    if args.context == "daemon":
+        serve(args.socket, args.workers, args.idle_timeout)
+    else:
+        main(args)
+
+
+if __name__ == "__main__":
+    # The dummyfailure command is client.py, which forwards jobs without
+    # importing this module
+    if (exit_code := try_forward(sys.argv[1:])) is not None:
+        sys.exit(exit_code)
+    cli()
@@ -0,0 +1,146 @@
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import PolyCollection
+
+from benchmark_timeline import generate_log
+from lifecycle import Lifecycle
+from plot_execution import MAX_HEIGHT, render, row_key
+from timeline import parse_log
+from timeline_store import load_timeline, save_timeline
+
+
+def legacy_render(lifecycle, max_height=MAX_HEIGHT):
+    # Reference copy of the original one-artist-per-task rendering loop
+    job_names = lifecycle.job_names
+    locations = {
+        location: f"image{i}" for i, location in enumerate(lifecycle.locations)
+    }
+    location_labels = [locations.get(l) for l in lifecycle.location_names] + [None]
+    location_color = dict(
+        zip(locations.values(), ["lightgreen", "peachpuff", "lightblue", "orchid"])
+    )
+    runs, errors = lifecycle.runs, lifecycle.errors
+    job_to_y = {
+        job: i
+        for i, job in enumerate(
+            sorted(
+                set(job_names[j] for j in runs["job"].tolist() + errors["job"].tolist())
+            )
+        )
+    }
+    height = min(len(job_to_y) * 0.6, max_height)
+    width = 16 / 9 * height
+    fontsize = min(width, height)
+    fig, ax = plt.subplots(figsize=(width, height))
+    for job, start, end, location in zip(
+        runs["job"].tolist(),
+        (runs["start"] / 10**6).tolist(),
+        (runs["end"] / 10**6).tolist(),
+        runs["location"].tolist(),
+    ):
+        ax.barh(
+            y=job_to_y[job_names[job]],
+            width=end - start,
+            left=start,
+            height=0.6,
+            color=location_color[location_labels[location]],
+        )
+    for job, time_ in zip(errors["job"].tolist(), (errors["time"] / 10**6).tolist()):
+        ax.plot(
+            time_,
+            job_to_y[job_names[job]],
+            marker="*",
+            color="black",
+            markersize=fontsize,
+        )
+    return fig, ax
+
+
+def grouped_render(lifecycle, max_height=MAX_HEIGHT):
+    return render(lifecycle, group_by_step=True, max_height=max_height)
+
+
+def check_rows(lifecycle, ax, group_by_step):
+    # Bars must fill consecutive rows, one per job or per step
+    shown = np.union1d(lifecycle.runs["job"], lifecycle.errors["job"])
+    rows = {
+        row_key(lifecycle.job_names[j], group_by_step=group_by_step)
+        for j in shown.tolist()
+    }
+    y = np.concatenate(
+        [
+            path.vertices[:, 1]
+            for collection in ax.collections
+            if isinstance(collection, PolyCollection)
+            for path in collection.get_paths()
+        ]
+    )
+    if np.unique(np.round(y)).tolist() != list(range(len(rows))):
+        raise Exception(f"Bars are not drawn on rows 0 to {len(rows) - 1}")
+
+
+def measure(function, lifecycle, max_height):
+    start = time.perf_counter()
+    fig, ax = function(lifecycle, max_height=max_height)
+    fig.canvas.draw()
+    elapsed = time.perf_counter() - start
+    if function is not legacy_render:
+        check_rows(lifecycle, ax, function is grouped_render)
+    plt.close(fig)
+    return elapsed
+
+
+def main(args):
+    renderers = {
+        "legacy": legacy_render,
+        "collections": render,
+        "grouped": grouped_render,
+    }
+    print(f"{'jobs':>8} {'runs':>8} {'renderer':>12} {'seconds':>10}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for jobs in args.jobs:
+            logfile = os.path.join(tmpdir, f"{jobs}.log")
+            generate_log(logfile, jobs, 0)
+            save_timeline(f"{logfile}.npz", parse_log(logfile))
+            lifecycle = Lifecycle(load_timeline(f"{logfile}.npz"), verbose=False)
+            for name in args.renderers:
+                if name == "legacy" and jobs > args.legacy_limit:
+                    continue
+                elapsed = min(
+                    measure(renderers[name], lifecycle, args.max_height)
+                    for _ in range(args.repeat)
+                )
+                print(
+                    f"{jobs:>8} {len(lifecycle.runs['job']):>8} {name:>12} {elapsed:>10.3f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the rendering time of plot_execution"
+    )
+    parser.add_argument("--jobs", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument(
+        "--renderers",
+        nargs="+",
+        default=["legacy", "collections", "grouped"],
+        choices=["legacy", "collections", "grouped"],
+    )
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=10000,
+        help="Skip the legacy renderer above this number of jobs",
+    )
+    parser.add_argument("--max-height", type=float, default=MAX_HEIGHT)
+    parser.add_argument("--repeat", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,168 @@
+import argparse
+import functools
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import timeline
+from timeline_store import serialize_jobs
+
+
+def generate_log(path, jobs, noise, seed=0):
+    # Synthetic StreamFlow debug log with the line kinds parsed by timeline.py
+    rng = random.Random(seed)
+    now = datetime(2024, 1, 1)
+    locations = [f"location-{i}" for i in range(3)]
+    steps = ["individuals", "individuals_merge", "frequency", "mutation_overlap"]
+    errors = [
+        "Error transferring file /a in location l0 to /b in location l1",
+        "Job /chromosome/x/0 has no locations",
+        "Expected File token of type File, got None.",
+        "FAILED copy from /a to /b",
+    ]
+
+    def write(level, message):
+        nonlocal now
+        now += timedelta(milliseconds=rng.randint(0, 50))
+        fd.write(f"{now.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} {level:<8} {message}\n")
+
+    with open(path, "w") as fd:
+        for i in range(jobs):
+            job = f"/chromosome/{rng.choice(steps)}/{i}"
+            for _ in range(rng.randint(1, 3)):
+                write(
+                    "DEBUG", f"Job {job} allocated on location {rng.choice(locations)}"
+                )
+                write("DEBUG", f"Job {job} changed status to RUNNING")
+                for _ in range(noise):
+                    write("DEBUG", f"Copying data for {job} from /tmp/in to /tmp/out")
+                    write("INFO", f"COMPLETED step {job}")
+                if rng.random() < 0.3:
+                    write("ERROR", f"FAILED Job {job} with error:")
+                    fd.write("\tTraceback (most recent call last):\n")
+                    write("INFO", f"Handling executing failure for job {job}")
+                    write("DEBUG", f"Job {job} changed status to RECOVERY")
+                    write("DEBUG", f"Job {job} changed status to ROLLBACK")
+                elif rng.random() < 0.1:
+                    write("ERROR", rng.choice(errors))
+                    write("INFO", f"Handling transferring failure for job {job}")
+                    write("DEBUG", f"Job {job} changed status to RECOVERY")
+                    write("DEBUG", f"Job {job} changed status to ROLLBACK")
+                else:
+                    write("DEBUG", f"Job {job} changed status to COMPLETED")
+                    break
+
+
+def legacy_parse(logfile):
+    # Reference copy of the original readlines/regex/strptime parser
+    pattern_status = timeline.pattern_status
+    pattern_handling = timeline.pattern_handling
+    error_line_pattern = timeline.error_line_pattern
+    allocation_pattern = timeline.allocation_pattern
+    local_alloc_pattern = timeline.local_alloc_pattern
+    remote_alloc_pattern = timeline.remote_alloc_pattern
+    combined = {}
+    workflow_start = None
+    error_type = None
+    with open(logfile) as fd:
+        for line in fd.readlines():
+            if workflow_start is None:
+                workflow_start = datetime.strptime(
+                    " ".join(line.split(" ")[:2]), "%Y-%m-%d %H:%M:%S.%f"
+                )
+            if match_ := pattern_status.match(line):
+                timestamp, job_name, status = match_.groups()
+                timestamp = (
+                    datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+                    - workflow_start
+                )
+                combined.setdefault(job_name, []).append(
+                    {"time": timestamp, "status": status}
+                )
+            elif match_ := pattern_handling.match(line):
+                timestamp, failure_type, job_name, step_name = match_.groups()
+                timestamp = (
+                    datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+                    - workflow_start
+                )
+                combined.setdefault(job_name, []).append(
+                    {"time": timestamp, "status": "ERROR", "error_type": error_type}
+                )
+                error_type = None
+            elif match_ := allocation_pattern.match(line):
+                timestamp, job_name, allocation = match_.groups()
+                if match_ := local_alloc_pattern.match(allocation):
+                    location_name = match_.group()
+                elif match_ := remote_alloc_pattern.match(allocation):
+                    location_name = match_.groups()[0]
+                timestamp = (
+                    datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+                    - workflow_start
+                )
+                combined.setdefault(job_name, []).append(
+                    {
+                        "time": timestamp,
+                        "status": "ALLOCATED",
+                        "location": location_name,
+                    }
+                )
+            elif match_ := error_line_pattern.match(line):
+                timestamp, error_message = match_.groups()
+                error_type = timeline.classify_error(error_message, error_type)
+    return combined
+
+
+def measure(function, logfile, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(logfile)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logfile = args.logfile
+        if logfile is None:
+            logfile = os.path.join(tmpdir, "streamflow.log")
+            generate_log(logfile, args.jobs, args.noise)
+        size = os.path.getsize(logfile)
+        print(f"Log file: {logfile} ({size / 10**6:.1f} MB)")
+        parsers = {
+            "legacy": legacy_parse,
+            "streaming": timeline.parse_log,
+            "parallel": functools.partial(
+                timeline.parse_log,
+                workers=args.workers,
+                chunk_size=args.chunk_size * 2**20,
+            ),
+        }
+        reference = None
+        for name, function in parsers.items():
+            elapsed, result = measure(function, logfile, args.repeat)
+            output = json.dumps(serialize_jobs(result), indent=2)
+            if reference is None:
+                reference = output
+            elif output != reference:
+                raise Exception(f"Parser {name} produced a different timeline")
+            print(
+                f"{name:>10}: {elapsed:.3f} seconds "
+                f"({size / elapsed / 10**6:.1f} MB/s, {len(result)} jobs)"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "logfile", nargs="?", help="StreamFlow logfile, synthesized if missing"
+    )
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--noise", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=16, help="MiB")
+    main(parser.parse_args())
@@ -0,0 +1,291 @@
+import argparse
+import glob
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from timeline import DECOMPRESSORS, DecompressingReader, parse_log
+from timeline_store import MICROSECOND, Timeline, encode
+
+# Experiment parameters encoded in the log paths, e.g. runs/probability=0.1/run3.log
+PARAM_PATTERN = re.compile(r"(\w+)=([^/]+?)(?=$|/|_|\.log)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    hash TEXT UNIQUE NOT NULL,
+    path TEXT NOT NULL,
+    ingested REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS params (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (run_id, key)
+);
+CREATE INDEX IF NOT EXISTS params_key_value ON params (key, value);
+CREATE TABLE IF NOT EXISTS events (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    job TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    location TEXT,
+    error_type TEXT,
+    error_message TEXT
+);
+CREATE INDEX IF NOT EXISTS events_run_job ON events (run_id, job);
+CREATE INDEX IF NOT EXISTS events_status ON events (status, run_id);
+"""
+
+
+def file_hash(path, chunk_size=2**20):
+    # Hash of the log content, so that a compressed copy of an ingested log
+    # is recognized as the same run
+    digest = hashlib.sha1()
+    opener = DECOMPRESSORS.get(os.path.splitext(path)[1])
+    with (
+        open(path, "rb")
+        if opener is None
+        else io.BufferedReader(DecompressingReader(path, opener), chunk_size)
+    ) as fd:
+        while chunk := fd.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_logs(sources, pattern):
+    logs = []
+    for source in sources:
+        if os.path.isdir(source):
+            # Compressed archives of the matching logs are ingested as well
+            for extension in ("", *DECOMPRESSORS):
+                logs.extend(
+                    glob.glob(
+                        os.path.join(source, "**", pattern + extension), recursive=True
+                    )
+                )
+        else:
+            logs.extend(glob.glob(source))
+    return sorted(set(os.path.abspath(log) for log in logs))
+
+
+def path_params(path):
+    return dict(PARAM_PATTERN.findall(path))
+
+
+def ingest_log(path, known_hashes, error_window=None):
+    # Runs in a worker process: logs already in the dataset are not parsed again,
+    # and a malformed log is reported without stopping the batch
+    try:
+        digest = file_hash(path)
+        if digest in known_hashes:
+            return path, digest, None, None
+        return path, digest, parse_log(path, error_window=error_window), None
+    except Exception as e:
+        return path, None, None, e
+
+
+def open_dataset(dataset):
+    db = sqlite3.connect(dataset)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    # Datasets created before the error messages were stored
+    if "error_message" not in {
+        column for _, column, *_ in db.execute("PRAGMA table_info(events)")
+    }:
+        db.execute("ALTER TABLE events ADD COLUMN error_message TEXT")
+    return db
+
+
+def store_run(db, path, digest, jobs, params):
+    with db:
+        cursor = db.execute(
+            "INSERT OR IGNORE INTO runs (hash, path, ingested) VALUES (?, ?, ?)",
+            (digest, path, time.time()),
+        )
+        if cursor.rowcount == 0:
+            # Another log of this batch had the same content
+            return None
+        run_id = cursor.lastrowid
+        db.executemany(
+            "INSERT INTO params VALUES (?, ?, ?)",
+            ((run_id, key, str(value)) for key, value in params.items()),
+        )
+        db.executemany(
+            "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    run_id,
+                    job_name,
+                    event["time"] // MICROSECOND,
+                    event["status"],
+                    str(event["location"]) if "location" in event else None,
+                    str(event["error_type"]) if "error_type" in event else None,
+                    event.get("error_message"),
+                )
+                for job_name, events in jobs.items()
+                for event in events
+            ),
+        )
+    return run_id
+
+
+def ingest(
+    dataset, sources, pattern="*.log", params=None, workers=1, error_window=None
+):
+    db = open_dataset(dataset)
+    try:
+        known_hashes = frozenset(h for (h,) in db.execute("SELECT hash FROM runs"))
+        logs = find_logs(sources, pattern)
+        ingested, skipped, failed = 0, 0, 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for path, digest, jobs, error in executor.map(
+                ingest_log,
+                logs,
+                [known_hashes] * len(logs),
+                [error_window] * len(logs),
+            ):
+                if error is not None:
+                    failed += 1
+                    print(f"Failed {path}: {error}")
+                    continue
+                run_id = None
+                if jobs is not None:
+                    run_id = store_run(
+                        db, path, digest, jobs, {**path_params(path), **(params or {})}
+                    )
+                if run_id is None:
+                    skipped += 1
+                    print(f"Skipping {path}: already ingested")
+                else:
+                    ingested += 1
+                    print(f"Ingested {path} as run {run_id}")
+        print(f"{ingested} runs ingested, {skipped} skipped, {failed} failed")
+    finally:
+        db.close()
+
+
+def list_runs(dataset):
+    db = open_dataset(dataset)
+    try:
+        for run_id, path, params, events, errors in db.execute(
+            "SELECT runs.run_id, runs.path, "
+            "(SELECT json_group_object(key, value) FROM params "
+            "WHERE params.run_id = runs.run_id), "
+            "(SELECT COUNT(*) FROM events WHERE events.run_id = runs.run_id), "
+            "(SELECT COUNT(*) FROM events "
+            "WHERE events.status = 'ERROR' AND events.run_id = runs.run_id) "
+            "FROM runs ORDER BY runs.run_id"
+        ):
+            print(run_id, path, params, f"{events} events, {errors} errors")
+    finally:
+        db.close()
+
+
+def find_runs(dataset, **params):
+    # Run ids whose experiment parameters match all the given values
+    db = open_dataset(dataset)
+    try:
+        query = "SELECT run_id FROM runs"
+        for key in params:
+            query += (
+                f" {'AND' if 'WHERE' in query else 'WHERE'} run_id IN "
+                "(SELECT run_id FROM params WHERE key = ? AND value = ?)"
+            )
+        return [
+            run_id
+            for (run_id,) in db.execute(
+                query, [v for kv in params.items() for v in map(str, kv)]
+            )
+        ]
+    finally:
+        db.close()
+
+
+def load_run(dataset, run_id):
+    db = open_dataset(dataset)
+    try:
+        jobs = {}
+        for job_name, time_, status, location, error_type, error_message in db.execute(
+            "SELECT job, time, status, location, error_type, error_message FROM events "
+            "WHERE run_id = ? ORDER BY rowid",
+            (run_id,),
+        ):
+            event = {"time": timedelta(microseconds=time_), "status": status}
+            if location is not None:
+                event["location"] = location
+            if error_type is not None:
+                event["error_type"] = error_type
+            if error_message is not None:
+                event["error_message"] = error_message
+            jobs.setdefault(job_name, []).append(event)
+    finally:
+        db.close()
+    columns, names = encode(jobs)
+    return Timeline(columns.__getitem__, names)
+
+
+def key_value(text):
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Expected KEY=VALUE, got {text}")
+    return key, value
+
+
+def main(args):
+    if args.list:
+        list_runs(args.dataset)
+    else:
+        error_window = None
+        if args.error_window > 0:
+            error_window = timedelta(seconds=args.error_window)
+        ingest(
+            args.dataset,
+            args.sources,
+            args.pattern,
+            dict(args.param),
+            args.workers,
+            error_window,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Parse a batch of StreamFlow logs into a single experiment dataset"
+    )
+    parser.add_argument("sources", nargs="*", help="Log files, directories or globs")
+    parser.add_argument(
+        "--dataset", default="experiments.db", help="SQLite dataset of all the runs"
+    )
+    parser.add_argument(
+        "--pattern", default="*.log", help="Logs searched in the given directories"
+    )
+    parser.add_argument(
+        "--param",
+        type=key_value,
+        action="append",
+        default=[],
+        help="Experiment parameter KEY=VALUE of all the ingested runs",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes parsing logs in parallel",
+    )
+    parser.add_argument(
+        "--error-window",
+        type=float,
+        default=30.0,
+        help="Attach each ERROR message to the nearest job failure within this many "
+        "seconds, 0 to disable",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the runs in the dataset"
+    )
+    main(parser.parse_args())
@@ -0,0 +1,172 @@
+import numpy as np
+
+# Jobs of the workflow plumbing, not shown in the plots
+SKIPPED_JOBS = ("-injector", "-collector", "get_interval", "get_chromosome")
+
+# Engine status codes: NONE precedes the first event of a job, OTHER is any
+# status without a transition
+STATUSES = (
+    "NONE",
+    "ALLOCATED",
+    "RUNNING",
+    "COMPLETED",
+    "ERROR",
+    "RECOVERY",
+    "ROLLBACK",
+    "OTHER",
+)
+NONE, ALLOCATED, RUNNING, COMPLETED, ERROR, RECOVERY, ROLLBACK, OTHER = range(
+    len(STATUSES)
+)
+
+INVALID, VALID, WARNING = 0, 1, 2
+# (previous status, status) -> outcome. RUNNING is valid whenever no run of the
+# job is open or after ALLOCATED, whatever this table says
+TRANSITIONS = np.zeros((len(STATUSES), len(STATUSES)), dtype="int8")
+TRANSITIONS[:, ALLOCATED] = VALID
+TRANSITIONS[RUNNING, [COMPLETED, ERROR]] = VALID
+# COMPLETED -> ROLLBACK: re-execute a completed job
+# RECOVERY -> ROLLBACK: re-execute a failed job
+TRANSITIONS[[COMPLETED, RECOVERY], ROLLBACK] = VALID
+# ERROR -> RECOVERY: re-execute a failed job
+TRANSITIONS[ERROR, RECOVERY] = VALID
+# RECOVERY -> ERROR: error scheduling
+TRANSITIONS[RECOVERY, ERROR] = VALID
+TRANSITIONS[ALLOCATED, [ERROR, COMPLETED]] = WARNING
+TRANSITIONS[RECOVERY, [RUNNING, COMPLETED]] = WARNING
+
+
+def last_index(mask, job_start):
+    # Index of the latest event matching mask up to each event, within its job
+    index = np.where(mask, np.arange(len(mask)), -1)
+    index = np.maximum.accumulate(index) if len(index) else index
+    return np.where(index >= job_start, index, -1)
+
+
+class Lifecycle:
+    def __init__(self, timeline, skipped_jobs=SKIPPED_JOBS, verbose=True):
+        self.job_names = timeline.names["job"]
+        self.location_names = timeline.names["location"]
+        self.error_type_names = timeline.names["error_type"] + ["unknown"]
+
+        keep = np.array(
+            [not any(s in job for s in skipped_jobs) for job in self.job_names],
+            dtype=bool,
+        )
+        job = timeline["job"]
+        selected = keep[job] if len(keep) else np.zeros(len(job), dtype=bool)
+        job = job[selected]
+        index = np.flatnonzero(selected)
+        # Events must be grouped by job, as written by timeline_store
+        if len(job) and np.count_nonzero(job[1:] != job[:-1]) + 1 != len(
+            np.unique(job)
+        ):
+            order = np.argsort(job, kind="stable")
+            job, index = job[order], index[order]
+        time = timeline["time"][index]
+        status_map = np.array(
+            [
+                STATUSES.index(name) if name in STATUSES[1:-1] else OTHER
+                for name in timeline.names["status"]
+            ],
+            dtype="int8",
+        )
+        status_names = timeline.names["status"]
+        status_code = timeline["status"][index]
+        status = status_map[status_code]
+        location = timeline["location"][index]
+        error_type = timeline["error_type"][index].astype("int32")
+        error_type[error_type < 0] = len(self.error_type_names) - 1
+
+        # Single pass of array operations over all the events
+        n = len(job)
+        first = np.ones(n, dtype=bool)
+        first[1:] = job[1:] != job[:-1]
+        job_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+        previous = np.empty(n, dtype="int8")
+        previous[0:1] = NONE
+        previous[1:] = status[:-1]
+        previous[first] = NONE
+
+        run_end = (previous == RUNNING) & ((status == COMPLETED) | (status == ERROR))
+        running = status == RUNNING
+        # A run is open from any RUNNING event to the next run end of the job
+        last_running = last_index(running, job_start)
+        last_end = last_index(run_end, job_start)
+        previous_running = np.full(n, -1)
+        previous_end = np.full(n, -1)
+        previous_running[1:] = last_running[:-1]
+        previous_end[1:] = last_end[:-1]
+        previous_running[first] = -1
+        previous_end[first] = -1
+        open_run = previous_running > previous_end
+        run_start = running & (~open_run | (previous == ALLOCATED))
+
+        outcome = TRANSITIONS[previous, status]
+        outcome[run_start | run_end] = VALID
+        if (invalid := np.flatnonzero(outcome == INVALID)).size:
+            i = invalid[0]
+            last_status = None if first[i] else status_names[status_code[i - 1]]
+            raise ValueError(
+                f"Unknown event status: {last_status} -> {status_names[status_code[i]]}"
+            )
+        if verbose:
+            for i in np.flatnonzero(outcome == WARNING):
+                message = (
+                    f"WARNING: job {self.job_names[job[i]]} "
+                    f"from {STATUSES[previous[i]]} to {STATUSES[status[i]]}"
+                )
+                if previous[i] == ALLOCATED and status[i] == ERROR:
+                    message += f": err: {self.error_type_names[error_type[i]]}"
+                print(message + " ")
+
+        # Runs: from the latest run start to each run end, on the latest location
+        ends = np.flatnonzero(run_end)
+        starts = last_index(run_start, job_start)[ends]
+        allocated = status == ALLOCATED
+        last_allocated = last_index(allocated, np.zeros(n, dtype=int))
+        run_location = np.where(
+            last_allocated[ends] >= 0, location[last_allocated[ends]], -1
+        )
+        self.runs = {
+            "job": job[ends],
+            "start": time[starts],
+            "end": time[ends],
+            "status": status[ends],
+            "location": run_location,
+        }
+
+        errors = np.flatnonzero(status == ERROR)
+        self.errors = {
+            "job": job[errors],
+            "time": time[errors],
+            "error_type": error_type[errors],
+        }
+
+        # Each ROLLBACK closes the latest ERROR of its job, later ones override
+        rollbacks = np.flatnonzero(status == ROLLBACK)
+        rolled_back = last_index(status == ERROR, job_start)[rollbacks]
+        if verbose:
+            for _ in range(np.count_nonzero(rolled_back < 0)):
+                print("Request rollback of a step which terminate correctly")
+        rollback_time = np.full(n, -1, dtype="int64")
+        np.maximum.at(
+            rollback_time,
+            rolled_back[rolled_back >= 0],
+            time[rollbacks][rolled_back >= 0],
+        )
+        self.latencies = {
+            "job": job[errors],
+            "error": time[errors],
+            "rollback": rollback_time[errors],
+        }
+
+        # Locations in order of first allocation, as labelled in the plots
+        allocated_locations = location[allocated]
+        _, first_allocation = np.unique(allocated_locations, return_index=True)
+        self.locations = [
+            self.location_names[allocated_locations[i]]
+            for i in sorted(first_allocation)
+            if allocated_locations[i] >= 0
+        ]
+        self.time_range = (time.min(), time.max()) if n else (0, 0)
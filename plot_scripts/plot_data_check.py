@@ -7,7 +7,7 @@ import numpy as np
 import argparse
 
 
-def main(args):
+def plot(benchmark_dir, directory="."):
     # Data structure: {size: [(num_files, mean_time, stddev_time)]}
     benchmark_data = defaultdict(list)
 
@@ -18,7 +18,7 @@ def main(args):
     )
 
     # Process each log file
-    for log_path in glob.glob(os.path.join(args.benchmark_dir, "*.out")):
+    for log_path in glob.glob(os.path.join(benchmark_dir, "*.out")):
         with open(log_path, "r") as f:
             content = f.read()
 
@@ -83,9 +83,13 @@ def main(args):
     plt.grid(True, which="both", linestyle="--", linewidth=0.5)
     plt.legend()
     plt.tight_layout()
-    plt.savefig("benchmark_test_f_summary_plot.png")
-    plt.savefig("benchmark_test_f_summary_plot.pdf")
-    plt.show()
+    os.makedirs(directory, exist_ok=True)
+    filepaths = [
+        os.path.join(directory, f"benchmark_test_f_summary_plot.{format_}")
+        for format_ in ("png", "pdf")
+    ]
+    for filepath in filepaths:
+        plt.savefig(filepath)
 
     print("checksum times of 5k files", files_5k)
 
@@ -134,12 +138,21 @@ def main(args):
     plt.grid(True, which="both", linestyle="--", linewidth=0.5)
     plt.legend(title="Number of files")
     plt.tight_layout()
-    plt.savefig("benchmark_summary_by_size.png")
-    plt.savefig("benchmark_summary_by_size.pdf")
+    for format_ in ("png", "pdf"):
+        filepaths.append(
+            os.path.join(directory, f"benchmark_summary_by_size.{format_}")
+        )
+        plt.savefig(filepaths[-1])
+    return filepaths
+
+
+def main(args):
+    plot(args.benchmark_dir, args.output_dir)
     plt.show()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("benchmark_dir")
+    parser.add_argument("--output-dir", default=".", help="Directory of the plots")
     main(parser.parse_args())
@@ -1,31 +1,70 @@
 import argparse
-import json
-from datetime import datetime, timedelta
+import os
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import plotly.io as pio
 
+from timeline_store import load_timeline
 
-def str_to_timedelta(time_str):
-    h, m, s = time_str.split(":")
-    return timedelta(hours=int(h), minutes=int(m), seconds=float(s))
+# Above this number of points SVG markers make the figure unusable
+WEBGL_THRESHOLD = 20000
 
 
-def deserialize_jobs(jobs):
-    return {
-        k: [
-            {v1: (str_to_timedelta(v2) if v1 == "time" else v2) for v1, v2 in v.items()}
-            for v in values
-        ]
-        for k, values in jobs.items()
-    }
+def density_figure(timeline, bins, group_by_step):
+    # Events with an error type, counted in time bucket x job group bins
+    errors = timeline["error_type"] >= 0
+    seconds = timeline.seconds()[errors]
+    job_names = timeline.names["job"]
+    if group_by_step:
+        groups = sorted({os.path.dirname(job) for job in job_names})
+        group_index = {group: i for i, group in enumerate(groups)}
+        group_of_job = np.array(
+            [group_index[os.path.dirname(job)] for job in job_names], dtype="int32"
+        )
+    else:
+        groups = job_names
+        group_of_job = np.arange(len(job_names), dtype="int32")
+    rows = group_of_job[timeline["job"][errors]]
+    counts, _, edges = np.histogram2d(
+        rows, seconds, bins=[np.arange(len(groups) + 1), bins]
+    )
+    # Groups with errors, in order of their first error
+    first_error = np.full(len(groups), np.inf)
+    np.minimum.at(first_error, rows, seconds)
+    order = np.argsort(first_error, kind="stable")[: np.isfinite(first_error).sum()]
+    fig = go.Figure(
+        go.Heatmap(
+            z=counts[order],
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=[groups[i] for i in order],
+            colorscale="Viridis",
+            colorbar=dict(title="Errors"),
+            hovertemplate="time: %{x:.1f} s<br>%{y}<br>errors: %{z}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title="Error Density Over Time by " + ("Step" if group_by_step else "Job"),
+        xaxis_title="Time (seconds)",
+        yaxis_title="Step" if group_by_step else "Job",
+        margin=dict(l=40, r=20, t=40, b=40),
+    )
+    return fig
 
 
-def main(args):
-    with open(args.timeline) as fd:
-        timeline = deserialize_jobs(json.load(fd))
+def plot(timeline, mode="auto", bins=200, group_by="step", directory=".", show=False):
+    # Plotly figures are not global like pyplot ones, so they are shown here
+    os.makedirs(directory, exist_ok=True)
+    if mode == "density":
+        fig = density_figure(timeline, bins, group_by == "step")
+        filepath = os.path.join(directory, f"errors_density_by_{group_by}.pdf")
+        fig.write_image(filepath)
+        if show:
+            fig.show()
+        return filepath
 
     # data = [
     #     {"time": v["time"], "job": k, "error_type": v["error_type"]}
@@ -42,18 +81,23 @@ def main(args):
     #     ],
     #     key=lambda x: x["job"],
     # )
-    data = [
-        {"time": v["time"], "job": k, "error_type": v.get("error_type", None)}
-        for k, values in timeline.items()
-        for v in values
-    ]
-    df = pd.DataFrame(data)
-    start_date = pd.Timestamp("2024-01-01")
-    df["time"] = start_date + df["time"]
-    df["time"] = (df["time"] - start_date).dt.total_seconds()
+    df = pd.DataFrame(
+        {
+            "time": timeline.seconds(),
+            "job": timeline.labels("job"),
+            "error_type": timeline.labels("error_type"),
+        }
+    )
 
     # job_order = sorted(df["job"].unique())
-    job_order = df.groupby("job")["time"].min().sort_values().index.tolist()
+    first_time = np.full(len(timeline.names["job"]), np.inf)
+    np.minimum.at(first_time, timeline["job"], df["time"].to_numpy())
+    job_order = [
+        timeline.names["job"][i]
+        for i in np.argsort(first_time, kind="stable")
+        if np.isfinite(first_time[i])
+    ]
+    webgl = mode == "webgl" or (mode == "auto" and len(df) > WEBGL_THRESHOLD)
 
     # Create scatter plot
     fig = px.scatter(
@@ -65,6 +109,7 @@ def main(args):
         title="Errors Over Time by Job",
         labels={"time": "Timestamp", "job": "Job", "error_type": "Error Type"},
         category_orders={"job": job_order},
+        render_mode="webgl" if webgl else "svg",
     )
     fig.update_layout(
         xaxis_title="Time",
@@ -81,11 +126,36 @@ def main(args):
             borderwidth=1,  # Border width (optional)
         ),
     )
-    fig.write_image("errors_over_time_by_job.pdf")
-    fig.show()
+    filepath = os.path.join(directory, "errors_over_time_by_job.pdf")
+    fig.write_image(filepath)
+    if show:
+        fig.show()
+    return filepath
+
+
+def main(args):
+    timeline = load_timeline(args.timeline)
+    plot(timeline, args.mode, args.bins, args.group_by, args.output_dir, show=True)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("timeline", help="Timeline file")
+    parser.add_argument(
+        "--mode",
+        choices=["auto", "svg", "webgl", "density"],
+        default="auto",
+        help=f"Marker rendering, auto switches to webgl above {WEBGL_THRESHOLD} "
+        "points, density draws binned error counts",
+    )
+    parser.add_argument(
+        "--bins", type=int, default=200, help="Time buckets in density mode"
+    )
+    parser.add_argument(
+        "--group-by",
+        choices=["job", "step"],
+        default="step",
+        help="Rows of the density mode",
+    )
+    parser.add_argument("--output-dir", default=".", help="Directory of the plots")
     main(parser.parse_args())
@@ -1,116 +1,75 @@
 import argparse
-import json
+import math
 import os
-from datetime import timedelta
 from pathlib import PurePath
 
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import PolyCollection
 from matplotlib.lines import Line2D
 from matplotlib.patches import Patch
 
+from lifecycle import Lifecycle
+from timeline_store import load_timeline
+
+MAX_HEIGHT = 40
+
+# Next free index of each (directory, prefix, format), the directory is only
+# listed on the first save
+_next_index = {}
+
 
 def save_plot_with_prefix(prefix, format_="png", directory="."):
     os.makedirs(directory, exist_ok=True)
-    existing_files = [
-        f for f in os.listdir(directory) if f.startswith(prefix) and f.endswith(format_)
-    ]
-    count = len(existing_files)
-    filename = f"{prefix}_{count + 1}.{format_}"
-    filepath = os.path.join(directory, filename)
+    key = (os.path.abspath(directory), prefix, format_)
+    if key not in _next_index:
+        existing_files = [
+            f
+            for f in os.listdir(directory)
+            if f.startswith(prefix) and f.endswith(format_)
+        ]
+        _next_index[key] = len(existing_files) + 1
+    filepath = os.path.join(directory, f"{prefix}_{_next_index[key]}.{format_}")
+    # Never overwrite a plot saved meanwhile by another process
+    while os.path.exists(filepath):
+        _next_index[key] += 1
+        filepath = os.path.join(directory, f"{prefix}_{_next_index[key]}.{format_}")
+    _next_index[key] += 1
     plt.savefig(filepath)
     print(f"Plot saved as {filepath}")
+    return filepath
 
 
-def str_to_timedelta(time_str):
-    h, m, s = time_str.split(":")
-    return timedelta(hours=int(h), minutes=int(m), seconds=float(s))
+def row_key(job, cut_tag=False, group_by_step=False):
+    if group_by_step:
+        return os.path.dirname(job)
+    elif cut_tag:
+        return os.path.dirname(job) + "." + job.split(".")[-1]
+    return job
 
 
-def deserialize_jobs(jobs):
-    return {
-        k: [
-            {v1: (str_to_timedelta(v2) if v1 == "time" else v2) for v1, v2 in v.items()}
-            for v in values
-        ]
-        for k, values in jobs.items()
+def render(lifecycle, cut_tag=False, group_by_step=False, max_height=MAX_HEIGHT):
+    job_names = lifecycle.job_names
+    locations = {
+        location: f"image{i}" for i, location in enumerate(lifecycle.locations)
     }
+    location_labels = [locations.get(l) for l in lifecycle.location_names] + [None]
+    runs = lifecycle.runs
+    errors = lifecycle.errors
 
-
-def main(args):
-    with open(args.timeline) as fd:
-        timeline = deserialize_jobs(json.load(fd))
-
-    tasks = []
-    error_points = []  # (job_name, time, error_type)
-    locations = {}
-    for job_name, events in timeline.items():
-        if (
-            "-injector" in job_name
-            or "-collector" in job_name
-            or "get_interval" in job_name
-            or "get_chromosome" in job_name
-        ):
-            continue
-
-        start_time = None
-        last_status = None
-        for event in events:
-            status = event["status"]
-
-            if status == "ALLOCATED":
-                if event["location"] not in locations.keys():
-                    locations[event["location"]] = f"image{len(locations)}"
-                location = locations[event["location"]]
-
-            elif status == "RUNNING" and (
-                start_time is None or last_status == "ALLOCATED"
-            ):
-                start_time = event["time"]
-            elif status in {"COMPLETED", "ERROR"} and last_status == "RUNNING":
-                tasks.append(
-                    (job_name, start_time, event["time"] - start_time, status, location)
-                )
-                start_time = None
-            elif status == "ROLLBACK" and (last_status in ("COMPLETED", "RECOVERY")):
-                # COMPLETED -> ROLLBACK: re-execute a completed job
-                # RECOVERY -> ROLLBACK: re-execute a failed job
-                pass
-            elif status == "RECOVERY" and last_status == "ERROR":
-                # ERROR -> RECOVERY: re-execute a failed job
-                pass
-            elif status == "ERROR" and last_status == "RECOVERY":
-                # RECOVERY -> ERROR: error scheduling
-                pass
-            elif last_status == "ALLOCATED" and status == "ERROR":
-                error_type = event.get("error_type", "unknown")
-                print(
-                    f"WARNING: job {job_name} from {last_status} to {status}: err: {error_type} "
-                )
-            elif last_status == "ALLOCATED" and status == "RUNNING":
-                print(f"WARNING: job {job_name} from {last_status} to {status} ")
-            elif last_status == "RECOVERY" and status == "RUNNING":
-                print(f"WARNING: job {job_name} from {last_status} to {status} ")
-            elif last_status == "RECOVERY" and status == "COMPLETED":
-                print(f"WARNING: job {job_name} from {last_status} to {status} ")
-            elif last_status == "ALLOCATED" and status == "COMPLETED":
-                print(f"WARNING: job {job_name} from {last_status} to {status} ")
-            else:
-                raise ValueError(f"Unknown event status: {last_status} -> {status}")
-            if status == "ERROR":
-                error_type = event.get("error_type", "unknown")
-                error_points.append((job_name, event["time"], error_type))
-            last_status = status
-    # Assign unique y-positions to jobs
+    # Assign unique y-positions to jobs, or to steps when grouping rows
+    shown = np.union1d(runs["job"], errors["job"])
     job_to_y = {
-        os.path.dirname(job) + "." + job.split(".")[-1] if args.cut_tag else job: i
-        for i, job in enumerate(
+        key: i
+        for i, key in enumerate(
             sorted(
-                set(job for job, _, _, _, _ in tasks).union(
-                    job for job, _, _ in error_points
-                )
+                {row_key(job_names[j], cut_tag, group_by_step) for j in shown.tolist()}
             )
         )
     }
+    y_of_job = np.array(
+        [job_to_y.get(row_key(job, cut_tag, group_by_step), -1) for job in job_names]
+    )
 
     # Mapping for the plots
     status_colors = {
@@ -123,7 +82,6 @@ def main(args):
         "retrieving": "^",
         "unknown": "x",
     }
-
     hatch_patterns = dict(
         zip(
             locations.values(),
@@ -134,52 +92,64 @@ def main(args):
         zip(locations.values(), ["lightgreen", "peachpuff", "lightblue", "orchid"])
     )
 
-    # Collect all used error types to generate legend dynamically
-    used_error_types = set(et for _, _, et in error_points)
-
-    # Plot bars
-    height = len(job_to_y) * 0.6
+    # The canvas grows with the rows up to max_height inches
+    height = min(len(job_to_y) * 0.6, max_height)
     width = 16 / 9 * height
     fontsize = 1 * min(width, height)
     print("image size", width, "x", height)
     fig, ax = plt.subplots(figsize=(width, height))
+
+    # One collection of bars per location
     bar_height = 0.6
-    for job_name, start, duration, status, location in tasks:
-        if args.cut_tag:
-            job_name = os.path.dirname(job_name) + "." + job_name.split(".")[-1]
-        y = job_to_y[job_name]
-        color = location_color[location]  # status_colors[status]
-        ax.barh(
-            y=y,
-            width=duration.total_seconds(),
-            left=start.total_seconds(),
-            height=bar_height,
-            color=color,
-            # hatch=hatch_patterns[location],
+    y = y_of_job[runs["job"]]
+    start = runs["start"] / 10**6
+    end = runs["end"] / 10**6
+    for code in np.unique(runs["location"]).tolist():
+        mask = runs["location"] == code
+        bottom, top = y[mask] - bar_height / 2, y[mask] + bar_height / 2
+        ax.add_collection(
+            PolyCollection(
+                np.stack(
+                    [
+                        np.column_stack([start[mask], bottom]),
+                        np.column_stack([start[mask], top]),
+                        np.column_stack([end[mask], top]),
+                        np.column_stack([end[mask], bottom]),
+                    ],
+                    axis=1,
+                ),
+                facecolors=location_color[location_labels[code]],
+                edgecolors="none",
+                # hatch=hatch_patterns[location_labels[code]],
+            )
         )
 
-    # Plot error points
-    for job_name, time, error_type in error_points:
-        if args.cut_tag:
-            job_name = os.path.dirname(job_name) + "." + job_name.split(".")[-1]
-        y = job_to_y[job_name]
-        marker = error_markers.get(error_type, "*")
-        ax.plot(
-            time.total_seconds(),
-            y,
-            marker=marker,
+    # One scatter of error points per error type
+    used_error_types = set()
+    for code in np.unique(errors["error_type"]).tolist():
+        error_type = lifecycle.error_type_names[code]
+        used_error_types.add(error_type)
+        mask = errors["error_type"] == code
+        ax.scatter(
+            errors["time"][mask] / 10**6,
+            y_of_job[errors["job"][mask]],
+            marker=error_markers.get(error_type, "*"),
             color="black",
-            markersize=fontsize,
+            s=fontsize**2,
             label=error_type,
         )
-    yticks = list(job_to_y.values())
+    ax.autoscale_view()
+
+    # Skip labels that would not fit in the canvas
+    stride = max(1, math.ceil(len(job_to_y) * fontsize * 3 / (height * 72)))
+    yticks = list(job_to_y.values())[::stride]
     ylabels = list(["\n".join(PurePath(j).parts[2:]) for j in job_to_y.keys()])
     ax.set_yticks(yticks)
-    ax.set_yticklabels(ylabels, fontsize=fontsize)
+    ax.set_yticklabels(ylabels[::stride], fontsize=fontsize)
     ax.tick_params(axis="x", labelsize=fontsize)
     ax.set_xlabel("Time (seconds)", fontsize=fontsize)
     ax.grid(True)
-    plt.title("Job Execution with Errors", fontsize=fontsize)
+    ax.set_title("Job Execution with Errors", fontsize=fontsize)
 
     legend_elements = [
         Patch(facecolor=color, label=f"Location: {location}")
@@ -210,8 +180,26 @@ def main(args):
             )
         )
 
-    ax.legend(handles=legend_elements, title="Job status", fontsize=fontsize)
-    if args.paper_text:
+    # Searching the best legend position is slow with many drawn elements
+    ax.legend(
+        handles=legend_elements,
+        title="Job status",
+        fontsize=fontsize,
+        loc="best" if len(runs["job"]) + len(errors["job"]) < 1000 else "upper right",
+    )
+    return fig, ax
+
+
+def plot(
+    lifecycle,
+    cut_tag=False,
+    group_by_step=False,
+    max_height=MAX_HEIGHT,
+    paper_text=False,
+    directory=".",
+):
+    render(lifecycle, cut_tag, group_by_step, max_height)
+    if paper_text:
         xlim = plt.xlim()
         ylim = plt.ylim()
         center_x = (xlim[0] + xlim[1]) / 2
@@ -256,7 +244,19 @@ def main(args):
         )
 
     plt.tight_layout()
-    save_plot_with_prefix("myplot", format_="pdf")
+    return save_plot_with_prefix("myplot", format_="pdf", directory=directory)
+
+
+def main(args):
+    lifecycle = Lifecycle(load_timeline(args.timeline))
+    plot(
+        lifecycle,
+        args.cut_tag,
+        args.group_by_step,
+        args.max_height,
+        args.paper_text,
+        args.output_dir,
+    )
     plt.show()
 
 
@@ -265,4 +265,16 @@ if __name__ == "__main__":
     parser.add_argument("timeline", help="Timeline file")
     parser.add_argument("--cut-tag", action="store_true")
     parser.add_argument("--paper-text", action="store_true")
+    parser.add_argument(
+        "--group-by-step",
+        action="store_true",
+        help="Draw one row per step instead of one row per job",
+    )
+    parser.add_argument(
+        "--max-height",
+        type=float,
+        default=MAX_HEIGHT,
+        help="Maximum height of the figure in inches",
+    )
+    parser.add_argument("--output-dir", default=".", help="Directory of the plots")
     main(parser.parse_args())
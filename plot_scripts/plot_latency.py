@@ -1,5 +1,4 @@
 import argparse
-import json
 import os
 from datetime import timedelta
 from pathlib import PurePath
@@ -8,144 +7,29 @@ import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 from matplotlib.patches import Patch
 
-
-def save_plot_with_prefix(prefix, format_="png", directory="."):
-    os.makedirs(directory, exist_ok=True)
-    existing_files = [
-        f for f in os.listdir(directory) if f.startswith(prefix) and f.endswith(format_)
-    ]
-    count = len(existing_files)
-    filename = f"{prefix}_{count + 1}.{format_}"
-    filepath = os.path.join(directory, filename)
-    plt.savefig(filepath)
-    print(f"Plot saved as {filepath}")
-
-
-def str_to_timedelta(time_str):
-    h, m, s = time_str.split(":")
-    return timedelta(hours=int(h), minutes=int(m), seconds=float(s))
-
-
-def deserialize_jobs(jobs):
-    return {
-        k: [
-            {v1: (str_to_timedelta(v2) if v1 == "time" else v2) for v1, v2 in v.items()}
-            for v in values
-        ]
-        for k, values in jobs.items()
-    }
+from lifecycle import Lifecycle
+from timeline_store import load_timeline
 
 
-def main(args):
-    with open(args.timeline) as fd:
-        timeline = deserialize_jobs(json.load(fd))
-
-    from_error_to_recovery_status = {}
-
-    tasks = []
-    error_points = []  # (job_name, time, error_type)
-    locations = {}
-
-    start_wf = None
-    end_wf = None
-
-    start_time = None
-    last_status = None
-    for job_name, events in timeline.items():
-        if (
-            "-injector" in job_name
-            or "-collector" in job_name
-            or "get_interval" in job_name
-            or "get_chromosome" in job_name
-        ):
-            continue
-
-        for event in events:
-            status = event["status"]
-
-            if start_wf is None or event["time"] < start_wf:
-                start_wf = event["time"]
-            elif end_wf is None or event["time"] > end_wf:
-                end_wf = event["time"]
-
-            if status == "ERROR":
-                from_error_to_recovery_status.setdefault(job_name, []).append(
-                    {"error_timestamp": event["time"], "start_recovery_timestamp": None}
-                )
-            elif status == "ROLLBACK":
-                if job_name in from_error_to_recovery_status.keys():
-                    from_error_to_recovery_status[job_name][-1][
-                        "start_recovery_timestamp"
-                    ] = event["time"]
-                else:
-                    print("Request rollback of a step which terminate correctly")
-
-            if status == "ALLOCATED":
-                if event["location"] not in locations.keys():
-                    locations[event["location"]] = f"image{len(locations)}"
-                location = locations[event["location"]]
-
-            elif status == "RUNNING" and (
-                start_time is None or last_status == "ALLOCATED"
-            ):
-                start_time = event["time"]
-            elif status in {"COMPLETED", "ERROR"} and last_status == "RUNNING":
-                tasks.append(
-                    (job_name, start_time, event["time"] - start_time, status, location)
-                )
-                start_time = None
-            elif status == "ROLLBACK" and (last_status in ("COMPLETED", "RECOVERY")):
-                # COMPLETED -> ROLLBACK: re-execute a completed job
-                # RECOVERY -> ROLLBACK: re-execute a failed job
-                pass
-            elif status == "RECOVERY" and last_status == "ERROR":
-                # ERROR -> RECOVERY: re-execute a failed job
-                pass
-            elif status == "ERROR" and last_status == "RECOVERY":
-                # RECOVERY -> ERROR: error scheduling
-                pass
-            elif last_status == "ALLOCATED" and status == "ERROR":
-                error_type = event.get("error_type", "unknown")
-                print(
-                    f"WARNING: job {job_name} from {last_status} to {status}: err: {error_type} "
-                )
-            elif last_status == "ALLOCATED" and status == "RUNNING":
-                print(f"WARNING: job {job_name} from {last_status} to {status} ")
-            elif last_status == "RECOVERY" and status == "RUNNING":
-                print(f"WARNING: job {job_name} from {last_status} to {status} ")
-            elif last_status == "RECOVERY" and status == "COMPLETED":
-                print(f"WARNING: job {job_name} from {last_status} to {status} ")
-            elif last_status == "ALLOCATED" and status == "COMPLETED":
-                print(f"WARNING: job {job_name} from {last_status} to {status} ")
-            else:
-                raise ValueError(f"Unknown event status: {last_status} -> {status}")
-            if status == "ERROR":
-                error_type = event.get("error_type", "unknown")
-                error_points.append((job_name, event["time"], error_type))
-            last_status = status
+def plot(lifecycle, directory="."):
+    job_names = lifecycle.job_names
+    start_wf, end_wf = (timedelta(microseconds=int(t)) for t in lifecycle.time_range)
 
+    latencies = lifecycle.latencies
+    rolled_back = latencies["rollback"] >= 0
+    for j in latencies["job"][~rolled_back].tolist():
+        print(f"WARNING: job {job_names[j]} failed without a rollback")
     per_step = {}
-    for j, fails in from_error_to_recovery_status.items():
-        for recovery_times in fails:
-            print(
-                f"Job {j} time to analyze rollback: {recovery_times['start_recovery_timestamp'] - recovery_times['error_timestamp']}"
-            )
-            step = os.path.dirname(j)
-            per_step.setdefault(step, []).append(
-                (
-                    recovery_times["start_recovery_timestamp"]
-                    - recovery_times["error_timestamp"]
-                ).total_seconds()
-            )
-    total_times = [
-        (
-            recovery_times["start_recovery_timestamp"]
-            - recovery_times["error_timestamp"]
-        ).total_seconds()
-        for _, fails in from_error_to_recovery_status.items()
-        for recovery_times in fails
-    ]
-
+    for j, latency in zip(
+        latencies["job"][rolled_back].tolist(),
+        (latencies["rollback"] - latencies["error"])[rolled_back].tolist(),
+    ):
+        print(
+            f"Job {job_names[j]} time to analyze rollback: {timedelta(microseconds=latency)}"
+        )
+        step = os.path.dirname(job_names[j])
+        per_step.setdefault(step, []).append(latency / 10**6)
+    total_times = [t for ts in per_step.values() for t in ts]
     # remove delay time
     total_times = [e - 5 for e in total_times]
     for ts in per_step.values():
@@ -273,15 +157,14 @@ def main(args):
     ax.grid(True)
     ax.legend()
 
-    # Save and show
-    plt.savefig("latency_evaluation.pdf", format="pdf", bbox_inches="tight")
-    plt.show()
+    # Save the plot, shown by the caller
+    os.makedirs(directory, exist_ok=True)
+    filepath = os.path.join(directory, "latency_evaluation.pdf")
+    plt.savefig(filepath, format="pdf", bbox_inches="tight")
 
     print(start_wf, end_wf)
     print(f"Workflow time: {(end_wf).total_seconds()}")
-    total = 0
-    for job_name, start_time, duration, status, location in tasks:
-        total += duration.total_seconds()
+    total = (lifecycle.runs["end"] - lifecycle.runs["start"]).sum() / 10**6
     print(f"time to compute", total)
     recover_with_delay = sum([t + 5 for t in total_times])
     recover_without = sum(total_times)
@@ -295,9 +178,16 @@ def main(args):
         recover_without,
         f"{recover_without / (recover_without + total)*  100:.2f}%",
     )
+    return filepath
+
+
+def main(args):
+    plot(Lifecycle(load_timeline(args.timeline)), args.output_dir)
+    plt.show()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("timeline", help="Timeline file")
+    parser.add_argument("--output-dir", default=".", help="Directory of the plots")
     main(parser.parse_args())
@@ -0,0 +1,159 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from lifecycle import Lifecycle
+from timeline_store import COLUMNS, Timeline, load_timeline
+
+FIGURES = ("execution", "latency", "errors", "data-check")
+
+
+def render(figure, data, args, show=False):
+    # Runs in a worker process, a failing figure does not stop the others.
+    # The plot scripts import pyplot, so they are only imported once the
+    # backend is chosen
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    try:
+        if figure == "execution":
+            import plot_execution
+
+            paths = [
+                plot_execution.plot(
+                    data,
+                    args.cut_tag,
+                    args.group_by_step,
+                    args.max_height or plot_execution.MAX_HEIGHT,
+                    directory=args.output_dir,
+                )
+            ]
+        elif figure == "latency":
+            import plot_latency
+
+            paths = [plot_latency.plot(data, args.output_dir)]
+        elif figure == "errors":
+            import plot_errors
+
+            paths = [
+                plot_errors.plot(
+                    data,
+                    args.mode,
+                    args.bins,
+                    args.group_by,
+                    args.output_dir,
+                    show,
+                )
+            ]
+        else:
+            import plot_data_check
+
+            paths = plot_data_check.plot(data, args.output_dir)
+        error = None
+    except Exception:
+        paths, error = [], traceback.format_exc()
+    finally:
+        if not show:
+            plt.close("all")
+    return figure, paths, error, time.perf_counter() - start
+
+
+def main(args):
+    figures = [f for f in args.figures if f != "data-check" or args.benchmark_dir]
+    if len(figures) < len(args.figures):
+        print("Skipping data-check: no --benchmark-dir given")
+
+    # The timeline is read once, and its columns sent to the workers in memory
+    start = time.perf_counter()
+    loaded = load_timeline(args.timeline)
+    columns = {column: loaded[column] for column in COLUMNS}
+    timeline = Timeline(columns.__getitem__, loaded.names)
+    data = {"errors": timeline, "data-check": args.benchmark_dir}
+    if "execution" in figures or "latency" in figures:
+        data["execution"] = data["latency"] = Lifecycle(timeline)
+    print(f"Timeline loaded in {time.perf_counter() - start:.2f} s")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.show:
+        # Interactive backends only work in the main process
+        results = [render(figure, data[figure], args, show=True) for figure in figures]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = list(
+                executor.map(
+                    render,
+                    figures,
+                    [data[figure] for figure in figures],
+                    [args] * len(figures),
+                )
+            )
+
+    failed = 0
+    for figure, paths, error, elapsed in results:
+        if error is None:
+            print(f"{figure}: {', '.join(paths)} ({elapsed:.2f} s)")
+        else:
+            failed += 1
+            print(f"{figure}: failed\n{error}", file=sys.stderr)
+    if args.show:
+        import matplotlib.pyplot as plt
+
+        plt.show()
+    if failed:
+        sys.exit(f"{failed} of {len(figures)} figures failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render all the figures of a timeline in parallel, without display"
+    )
+    parser.add_argument("timeline", help="Timeline file")
+    parser.add_argument(
+        "--output-dir", default="plots", help="Directory of the rendered figures"
+    )
+    parser.add_argument(
+        "--figures",
+        nargs="+",
+        choices=FIGURES,
+        default=list(FIGURES),
+        help="Figures to render",
+    )
+    parser.add_argument(
+        "--benchmark-dir", help="Data check benchmark outputs, see plot_data_check.py"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(len(FIGURES), os.cpu_count()),
+        help="Number of processes rendering figures in parallel",
+    )
+    parser.add_argument(
+        "--show",
+        action="store_true",
+        help="Render in this process and display the figures interactively",
+    )
+    # Options of the single plot scripts
+    parser.add_argument("--cut-tag", action="store_true")
+    parser.add_argument("--group-by-step", action="store_true")
+    parser.add_argument(
+        "--max-height",
+        type=float,
+        help="Maximum height of the execution figure in inches, see plot_execution.py",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["auto", "svg", "webgl", "density"],
+        default="auto",
+        help="Rendering of the errors figure, see plot_errors.py",
+    )
+    parser.add_argument("--bins", type=int, default=200)
+    parser.add_argument("--group-by", choices=["job", "step"], default="step")
+    args = parser.parse_args()
+    # Headless unless the figures are shown. The environment variable selects
+    # the backend before pyplot is imported, here and in the worker processes
+    if not args.show:
+        os.environ["MPLBACKEND"] = "Agg"
+    main(args)
@@ -1,159 +1,532 @@
 import argparse
+import bisect
+import bz2
+import gzip
+import io
 import json
+import lzma
+import os
+import queue
 import re
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 
-
-def serialize_jobs(jobs):
-    return {
-        k: [{v1: str(v2) for v1, v2 in v.items()} for v in values]
-        for k, values in jobs.items()
-    }
+from timeline_store import FORMATS, MICROSECOND, save_timeline
 
 
 def find_nearest_error(failure_time_dt, error_list):
-    nearest_error = None
-    nearest_time = None
-    min_diff = float("inf")
-    for error in error_list:
-        if (
-            time_diff := abs((failure_time_dt - error["time"]).total_seconds())
-        ) < min_diff:
-            min_diff = time_diff
-            nearest_error = error
-            nearest_time = error["time"]
-    return nearest_time, nearest_error
+    # error_list must be sorted by time
+    i = bisect.bisect_left(error_list, failure_time_dt, key=lambda e: e["time"])
+    nearest_error = min(
+        error_list[max(i - 1, 0) : i + 1],
+        key=lambda e: abs(failure_time_dt - e["time"]),
+        default=None,
+    )
+    if nearest_error is None:
+        return None, None
+    return nearest_error["time"], nearest_error
 
 
-def main(args):
+start_executing = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3}) INFO +EXECUTING step (\/[^\s]+) \(job ([^\)]+)\) on location ([^\s]+) into directory ([^\s:]+):$"
+)
 
-    start_executing = re.compile(
-        r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3}) INFO +EXECUTING step (\/[^\s]+) \(job ([^\)]+)\) on location ([^\s]+) into directory ([^\s:]+):$"
-    )
+# Status
+pattern_status = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})\sDEBUG\s+Job ([^\s]+) changed status to ([A-Z]+)$"
+)
+# Handling error
+pattern_handling = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})\s+INFO\s+Handling ([\w]+) failure for job ([^\s]+)(?: on step ([^\s]+))?$"
+)
+# Error
+error_line_pattern = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})\s+ERROR\s+(.+)$"
+)
+failed_job_pattern = re.compile(r"^FAILED Job ([^\s]+) with error:$")
+transfer_error_1_pattern = re.compile(
+    r"^Error transferring file ([^\s]+) in location ([^\s]+) to ([^\s]+) in location ([^\s]+)$"
+)
+transfer_error_2_pattern = re.compile(
+    r"^Error creating file ([^\s]+) with path ([^\s]+) in locations \[(.*?)\]\.$"
+)
+transfer_error_3_pattern = re.compile(r"^FAILED copy from (.+) to (.+)$")
+transfer_error_4_pattern = re.compile(r"^Job ([^\s]+) has no locations$")
+scheduling_pattern = re.compile("a")
+output_process_1_pattern = re.compile(
+    r"^Expected (\S+) token of type (\S+), got (\S+)\.$"
+)
+output_process_2_pattern = re.compile(r"Token (\S+) is not optional")
+output_process_3_pattern = re.compile(r"File (.+) does not exist$")
 
-    # Status
-    pattern_status = re.compile(
-        r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})\sDEBUG\s+Job ([^\s]+) changed status to ([A-Z]+)$"
-    )
-    # Handling error
-    pattern_handling = re.compile(
-        r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})\s+INFO\s+Handling ([\w]+) failure for job ([^\s]+)(?: on step ([^\s]+))?$"
-    )
-    # Error
-    error_line_pattern = re.compile(
-        r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})\s+ERROR\s+(.+)$"
-    )
-    failed_job_pattern = re.compile(r"^FAILED Job ([^\s]+) with error:$")
-    transfer_error_1_pattern = re.compile(
-        r"^Error transferring file ([^\s]+) in location ([^\s]+) to ([^\s]+) in location ([^\s]+)$"
-    )
-    transfer_error_2_pattern = re.compile(
-        r"^Error creating file ([^\s]+) with path ([^\s]+) in locations \[(.*?)\]\.$"
-    )
-    transfer_error_3_pattern = re.compile(r"^FAILED copy from (.+) to (.+)$")
-    transfer_error_4_pattern = re.compile(r"^Job ([^\s]+) has no locations$")
-    scheduling_pattern = re.compile("a")
-    output_process_1_pattern = re.compile(
-        r"^Expected (\S+) token of type (\S+), got (\S+)\.$"
+allocation_pattern = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})\s+DEBUG\s+Job\s+([^\s]+)\s+allocated\s+(.+)$"
+)
+local_alloc_pattern = re.compile(r"locally$")
+remote_alloc_pattern = re.compile(r"on location\s+(.+)$")
+
+storage_size_err_pattern = re.compile(
+    r"Storage (.+) with (.+) paths cannot have negative size: (.+)$"
+)
+
+# Placeholder for parser state inherited from the previous chunk of the log
+CARRIED = "<carried>"
+DECOMPRESSORS = {".bz2": bz2.open, ".gz": gzip.open, ".xz": lzma.open}
+
+
+class TimelineParser:
+    def __init__(self, workflow_start=None, error_type=None, location_name=None):
+        self.combined = {}
+        self.workflow_start = workflow_start
+        self.error_type = error_type
+        self.location_name = location_name
+        # Classified ERROR messages, to be correlated with the job events
+        self.errors = []
+        # Events whose error_type or location still depends on a previous chunk
+        self.pending = []
+        self._days = {}
+
+    def timestamp(self, line):
+        # Milliseconds of the fixed "YYYY-mm-dd HH:MM:SS.fff" prefix, parsed by
+        # slicing: only the date goes through strptime, once per day
+        if (days := self._days.get(date := line[:10])) is None:
+            days = self._days[date] = datetime.strptime(date, "%Y-%m-%d").toordinal()
+        return (
+            ((days * 24 + int(line[11:13])) * 60 + int(line[14:16])) * 60
+            + int(line[17:19])
+        ) * 1000 + int(line[20:23])
+
+    def elapsed(self, line):
+        return timedelta(milliseconds=self.timestamp(line) - self.workflow_start)
+
+    def feed(self, line):
+        if self.workflow_start is None:
+            self.workflow_start = self.timestamp(line)
+        # Cheap level and keyword checks reject most lines before any regex
+        level = line[23:33]
+        if "DEBUG" in level:
+            if "changed status to" in line:
+                if match_ := pattern_status.match(line):
+                    _, job_name, status = match_.groups()
+                    self.combined.setdefault(job_name, []).append(
+                        {"time": self.elapsed(line), "status": status}
+                    )
+                    return
+            if " allocated " in line and (match_ := allocation_pattern.match(line)):
+                _, job_name, allocation = match_.groups()
+                if match_ := local_alloc_pattern.match(allocation):
+                    self.location_name = match_.group()
+                elif match_ := remote_alloc_pattern.match(allocation):
+                    self.location_name = match_.groups()[0]
+                event = {
+                    "time": self.elapsed(line),
+                    "status": "ALLOCATED",
+                    "location": self.location_name,
+                }
+                if self.location_name == CARRIED:
+                    self.pending.append(event)
+                self.combined.setdefault(job_name, []).append(event)
+        elif "INFO" in level:
+            if "Handling " in line and (match_ := pattern_handling.match(line)):
+                _, failure_type, job_name, step_name = match_.groups()
+                event = {
+                    "time": self.elapsed(line),
+                    "status": "ERROR",
+                    "error_type": self.error_type,
+                }
+                if self.error_type == CARRIED:
+                    self.pending.append(event)
+                self.combined.setdefault(job_name, []).append(event)
+                self.error_type = None
+        elif "ERROR" in level:
+            if match_ := error_line_pattern.match(line):
+                _, error_message = match_.groups()
+                self.error_type = classify_error(error_message, self.error_type)
+                error = {
+                    "time": self.elapsed(line),
+                    "error_type": self.error_type,
+                    "message": error_message,
+                }
+                if self.error_type == CARRIED:
+                    self.pending.append(error)
+                self.errors.append(error)
+
+
+def classify_error(error_message, error_type=None):
+    if failed_job_pattern.match(error_message):
+        return "executing"
+    elif (
+        transfer_error_1_pattern.match(error_message)
+        or transfer_error_2_pattern.match(error_message)
+        or transfer_error_3_pattern.match(error_message)
+        or transfer_error_4_pattern.match(error_message)
+    ):
+        return "transferring"
+    elif (
+        output_process_1_pattern.match(error_message)
+        or output_process_2_pattern.match(error_message)
+        or output_process_3_pattern.match(error_message)
+    ):
+        return "retrieving"
+    elif scheduling_pattern.match(error_message):
+        return "initializing"
+    elif storage_size_err_pattern.match(error_message):
+        print("Warning: storage size error")
+        return "scheduling"
+    elif error_message == "FAILED Workflow execution":
+        print("Warning: failed workflow")
+        return error_type
+    else:
+        raise Exception(f"Unexpected error: {error_message}")
+
+
+def error_job(error_message):
+    match_ = failed_job_pattern.match(error_message) or transfer_error_4_pattern.match(
+        error_message
     )
-    output_process_2_pattern = re.compile(r"Token (\S+) is not optional")
-    output_process_3_pattern = re.compile(r"File (.+) does not exist$")
+    return match_.group(1) if match_ else None
+
+
+def correlate_errors(combined, errors, window):
+    # Attach each ERROR message to the nearest ERROR event within window of the
+    # job it names or, only when it names none, of any job with the same error
+    # type. Returns the messages left unattached
+    job_errors = {
+        job_name: [event for event in events if event["status"] == "ERROR"]
+        for job_name, events in combined.items()
+    }
+    typed_errors = {}
+    for event in sorted(
+        (event for events in job_errors.values() for event in events),
+        key=lambda e: e["time"],
+    ):
+        typed_errors.setdefault(event.get("error_type"), []).append(event)
+    unattached = []
+    for error in errors:
+        # A message naming a job is only attached to the failures of that job
+        if (job_name := error_job(error["message"])) is not None:
+            candidates = job_errors.get(job_name, [])
+        else:
+            candidates = typed_errors.get(error["error_type"], [])
+        nearest_time, nearest_error = find_nearest_error(error["time"], candidates)
+        if nearest_error is None or abs(nearest_time - error["time"]) > window:
+            unattached.append(error)
+            continue
+        if "error_message" in nearest_error:
+            nearest_error["error_message"] += "\n" + error["message"]
+        else:
+            nearest_error["error_message"] = error["message"]
+    return unattached
+
+
+class DecompressingReader(io.RawIOBase):
+    # Decompresses in a background thread, overlapped with the parsing: the
+    # codecs release the GIL while working on large blocks
+    def __init__(self, logfile, opener, block_size=2**20, prefetch=8):
+        self._queue = queue.Queue(prefetch)
+        self._stop = threading.Event()
+        self._block = memoryview(b"")
+        self._thread = threading.Thread(
+            target=self._decompress, args=(logfile, opener, block_size), daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
 
-    allocation_pattern = re.compile(
-        r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})\s+DEBUG\s+Job\s+([^\s]+)\s+allocated\s+(.+)$"
+    def _decompress(self, logfile, opener, block_size):
+        try:
+            with opener(logfile, "rb") as fd:
+                while block := fd.read(block_size):
+                    if not self._put(block):
+                        return
+            self._put(b"")
+        except Exception as e:
+            self._put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._block:
+            block = self._queue.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                # Leave the end of stream marker for any further read
+                self._queue.put(b"")
+                return 0
+            self._block = memoryview(block)
+        size = min(len(buffer), len(self._block))
+        buffer[:size] = self._block[:size]
+        self._block = self._block[size:]
+        return size
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        super().close()
+
+
+def open_log(logfile):
+    if (opener := DECOMPRESSORS.get(os.path.splitext(logfile)[1])) is None:
+        return open(logfile, buffering=2**20)
+    return io.TextIOWrapper(
+        io.BufferedReader(DecompressingReader(logfile, opener), 2**20)
     )
-    local_alloc_pattern = re.compile(r"locally$")
-    remote_alloc_pattern = re.compile(r"on location\s+(.+)$")
 
-    storage_size_err_pattern = re.compile(
-        r"Storage (.+) with (.+) paths cannot have negative size: (.+)$"
+
+def chunk_bounds(logfile, chunk_size):
+    # Byte ranges of about chunk_size bytes, each ending on a newline
+    bounds = []
+    with open(logfile, "rb") as fd:
+        size = os.fstat(fd.fileno()).st_size
+        start = 0
+        while start < size:
+            fd.seek(min(start + chunk_size, size) - 1)
+            fd.readline()
+            end = fd.tell()
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def parse_chunk(logfile, start, end, workflow_start):
+    parser = TimelineParser(workflow_start, error_type=CARRIED, location_name=CARRIED)
+    with open(logfile, "rb") as fd:
+        fd.seek(start)
+        data = fd.read(end - start)
+    for line in io.TextIOWrapper(io.BytesIO(data)):
+        parser.feed(line)
+    # Pending events are pickled together with combined, so they stay shared
+    return (
+        parser.combined,
+        parser.errors,
+        parser.pending,
+        parser.error_type,
+        parser.location_name,
     )
 
+
+def parse_log(logfile, workers=1, chunk_size=2**26, error_window=None):
+    if workers > 1 and os.path.splitext(logfile)[1] in DECOMPRESSORS:
+        # Compressed streams cannot be split at arbitrary byte offsets
+        print("Compressed logfile: parsing it in a single process")
+        workers = 1
+    if workers <= 1:
+        parser = TimelineParser()
+        with open_log(logfile) as fd:
+            for line in fd:
+                parser.feed(line)
+        combined, errors = parser.combined, parser.errors
+    else:
+        combined, errors = parse_chunks(logfile, workers, chunk_size)
+    if error_window is not None:
+        attached = len(errors) - len(correlate_errors(combined, errors, error_window))
+        print(f"Attached {attached} of {len(errors)} error messages to job events")
+    return combined
+
+
+def parse_chunks(logfile, workers, chunk_size):
+    with open(logfile) as fd:
+        first_line = fd.readline()
+    if not first_line:
+        return {}, []
+    workflow_start = TimelineParser().timestamp(first_line)
+    bounds = chunk_bounds(logfile, chunk_size)
     combined = {}
-    workflow_start = None
-    with open(args.logfile) as fd:
-        for line in fd.readlines():
-            timestamp, job_name, status, location = None, None, None, None
-            if workflow_start is None:
-                workflow_start = datetime.strptime(
-                    " ".join(line.split(" ")[:2]), "%Y-%m-%d %H:%M:%S.%f"
-                )
-            if match_ := pattern_status.match(line):
-                timestamp, job_name, status = match_.groups()
-                timestamp = (
-                    datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
-                    - workflow_start
-                )
-                combined.setdefault(job_name, []).append(
-                    {"time": timestamp, "status": status}
-                )
-            elif match_ := pattern_handling.match(line):
-                timestamp, failure_type, job_name, step_name = match_.groups()
-                timestamp = (
-                    datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
-                    - workflow_start
+    errors = []
+    error_type, location_name = None, None
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (
+            chunk,
+            chunk_errors,
+            pending,
+            chunk_error_type,
+            chunk_location_name,
+        ) in executor.map(
+            parse_chunk,
+            *zip(*((logfile, start, end, workflow_start) for start, end in bounds)),
+        ):
+            # Resolve the state each chunk inherited from the previous ones
+            for event in pending:
+                if event.get("error_type") == CARRIED:
+                    event["error_type"] = error_type
+                if event.get("location") == CARRIED:
+                    event["location"] = location_name
+            if chunk_error_type != CARRIED:
+                error_type = chunk_error_type
+            if chunk_location_name != CARRIED:
+                location_name = chunk_location_name
+            for job_name, events in chunk.items():
+                combined.setdefault(job_name, []).extend(events)
+            errors.extend(chunk_errors)
+    return combined, errors
+
+
+def initial_checkpoint():
+    return {
+        "offset": 0,
+        "store_size": 0,
+        "workflow_start": None,
+        "error_type": None,
+        "location_name": None,
+        # ERROR messages whose failure event may still come in a later batch
+        "errors": [],
+    }
+
+
+def load_checkpoint(checkpoint):
+    try:
+        with open(checkpoint) as fd:
+            return json.load(fd)
+    except FileNotFoundError:
+        return initial_checkpoint()
+
+
+def save_checkpoint(checkpoint, state):
+    with open(f"{checkpoint}.tmp", "w") as fd:
+        json.dump(state, fd)
+        fd.flush()
+        os.fsync(fd.fileno())
+    os.replace(f"{checkpoint}.tmp", checkpoint)
+
+
+def load_store(store):
+    # Rebuild the serialized timeline from the append-only event store
+    combined = {}
+    with open(store) as fd:
+        for line in fd:
+            event = json.loads(line)
+            combined.setdefault(event.pop("job"), []).append(event)
+    return combined
+
+
+def follow(logfile, store, interval, error_window=None, chunk_size=2**26):
+    if os.path.splitext(logfile)[1] in DECOMPRESSORS:
+        raise Exception("Follow mode needs a plain text logfile")
+    checkpoint = f"{store}.checkpoint"
+    state = load_checkpoint(checkpoint)
+    with open(store, "a+b") as store_fd:
+        # Drop events appended after the last checkpoint by an interrupted run
+        store_fd.truncate(state["store_size"])
+        while True:
+            with open(logfile, "rb") as fd:
+                if os.fstat(fd.fileno()).st_size < state["offset"]:
+                    print("Logfile was truncated, restarting from the beginning")
+                    state = initial_checkpoint()
+                    store_fd.truncate(0)
+                fd.seek(state["offset"])
+                # Bounded batches, each ending on a newline and checkpointed
+                data = fd.read(chunk_size)
+                full = len(data) == chunk_size
+                if full:
+                    data += fd.readline()
+            # Only complete lines are parsed, the rest is read again next time
+            data = data[: data.rfind(b"\n") + 1]
+            if data:
+                parser = TimelineParser(
+                    state["workflow_start"],
+                    state["error_type"],
+                    state["location_name"],
                 )
-                combined.setdefault(job_name, []).append(
-                    {"time": timestamp, "status": "ERROR", "error_type": error_type}
+                for line in io.TextIOWrapper(io.BytesIO(data)):
+                    parser.feed(line)
+                errors = []
+                if error_window is not None:
+                    # Messages carried over from the previous batches come first
+                    unattached = correlate_errors(
+                        parser.combined,
+                        [
+                            {**error, "time": timedelta(microseconds=error["time"])}
+                            for error in state.get("errors", [])
+                        ]
+                        + parser.errors,
+                        error_window,
+                    )
+                    # Keep the messages that a later failure event may still match
+                    latest = max(
+                        (
+                            event["time"]
+                            for job_events in parser.combined.values()
+                            for event in job_events
+                        ),
+                        default=None,
+                    )
+                    errors = [
+                        {**error, "time": error["time"] // MICROSECOND}
+                        for error in unattached
+                        if latest is None or latest - error["time"] <= error_window
+                    ]
+                events = sorted(
+                    (
+                        {"job": job_name, **event}
+                        for job_name, job_events in parser.combined.items()
+                        for event in job_events
+                    ),
+                    key=lambda e: e["time"],
                 )
-                error_type = None
-            elif match_ := allocation_pattern.match(line):
-                timestamp, job_name, allocation = match_.groups()
-                if match_ := local_alloc_pattern.match(allocation):
-                    location_name = match_.group()
-                elif match_ := remote_alloc_pattern.match(allocation):
-                    location_name = match_.groups()[0]
-                timestamp = (
-                    datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
-                    - workflow_start
+                store_fd.write(
+                    "".join(
+                        json.dumps({k: str(v) for k, v in event.items()}) + "\n"
+                        for event in events
+                    ).encode()
                 )
-                combined.setdefault(job_name, []).append(
-                    {
-                        "time": timestamp,
-                        "status": "ALLOCATED",
-                        "location": location_name,
-                    }
+                store_fd.flush()
+                os.fsync(store_fd.fileno())
+                state = {
+                    "offset": state["offset"] + len(data),
+                    "store_size": store_fd.tell(),
+                    "workflow_start": parser.workflow_start,
+                    "error_type": parser.error_type,
+                    "location_name": parser.location_name,
+                    "errors": errors,
+                }
+                save_checkpoint(checkpoint, state)
+                failures = sum(e["status"] == "ERROR" for e in events)
+                print(
+                    f"{time.strftime('%H:%M:%S')} parsed {len(data)} bytes: "
+                    f"{len(events)} events, {len(parser.combined)} jobs, "
+                    f"{failures} failures"
                 )
-            elif match_ := error_line_pattern.match(line):
-                timestamp, error_message = match_.groups()
-                timestamp = (
-                    datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
-                    - workflow_start
-                )
-                if failed_job_pattern.match(error_message):
-                    error_type = "executing"
-                elif (
-                    transfer_error_1_pattern.match(error_message)
-                    or transfer_error_2_pattern.match(error_message)
-                    or transfer_error_3_pattern.match(error_message)
-                    or transfer_error_4_pattern.match(error_message)
-                ):
-                    error_type = "transferring"
-                elif (
-                    output_process_1_pattern.match(error_message)
-                    or output_process_2_pattern.match(error_message)
-                    or output_process_3_pattern.match(error_message)
-                ):
-                    error_type = "retrieving"
-                elif scheduling_pattern.match(error_message):
-                    error_type = "initializing"
-                elif storage_size_err_pattern.match(error_message):
-                    print("Warning: storage size error")
-                    error_type = "scheduling"
-                elif error_message == "FAILED Workflow execution":
-                    print("Warning: failed workflow")
-                else:
-                    raise Exception(f"Unexpected error: {error_message}")
-                # combined.setdefault(job_name, []).append(
-                #     {
-                #         "time": timestamp,
-                #         "status": "ERROR",
-                #         "error_type": error_type,
-                #     }
-                # )
-    # print(serialize_jobs(jobs))
-    # print(serialize_jobs(failures))
-    # print(json.dumps(serialize_jobs(combined), indent=2))
+            if not full:
+                time.sleep(interval)
+
+
+def main(args):
+    if args.output is None:
+        # Next to the log, so that different runs do not overwrite each other
+        stem, extension = os.path.splitext(args.logfile)
+        if extension in DECOMPRESSORS:
+            stem = os.path.splitext(stem)[0]
+        args.output = f"{stem}.timeline.npz"
+    error_window = None
+    if args.error_window > 0:
+        error_window = timedelta(seconds=args.error_window)
+    if args.follow:
+        try:
+            follow(
+                args.logfile,
+                args.store,
+                args.interval,
+                error_window,
+                args.chunk_size * 2**20,
+            )
+        except KeyboardInterrupt:
+            pass
+        save_timeline(args.output, load_store(args.store))
+        return
+    combined = parse_log(
+        args.logfile, args.workers, args.chunk_size * 2**20, error_window
+    )
     print(
         "Number of steps",
         len(
@@ -164,8 +537,7 @@ def main(args):
             }
         ),
     )
-    with open("timeline.json", "w") as fd:
-        json.dump(serialize_jobs(combined), fd, indent=2)
+    save_timeline(args.output, combined)
 
 
 if __name__ == "__main__":
@@ -173,4 +545,45 @@ if __name__ == "__main__":
     parser.add_argument(
         "logfile", help="StreamFlow logfile of an execution in debug mode"
     )
+    parser.add_argument(
+        "--output",
+        help="Timeline file, the format is chosen by its extension among "
+        f"{FORMATS} (default: <logfile>.timeline.npz)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes parsing the log in parallel",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=64,
+        help="Size in MiB of the log chunks parsed by each process, and of the "
+        "batches read in follow mode",
+    )
+    parser.add_argument(
+        "--error-window",
+        type=float,
+        default=30.0,
+        help="Attach each ERROR message to the nearest job failure within this many "
+        "seconds, 0 to disable",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep parsing the logfile as it grows, resuming from the last checkpoint",
+    )
+    parser.add_argument(
+        "--store",
+        default="timeline.jsonl",
+        help="Append-only event store written in follow mode",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5.0,
+        help="Seconds between two polls of the logfile in follow mode",
+    )
     main(parser.parse_args())
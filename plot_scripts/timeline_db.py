@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import posixpath
+import sqlite3
+from datetime import timedelta
+
+from timeline_store import FORMATS, save_timeline
+
+# streamflow.core.workflow.Status, failures are reported as ERROR like in the logs
+STATUSES = {
+    0: "WAITING",
+    1: "FIREABLE",
+    2: "RUNNING",
+    3: "SKIPPED",
+    4: "COMPLETED",
+    5: "ERROR",
+    6: "CANCELLED",
+    7: "ROLLBACK",
+    8: "RECOVERY",
+}
+
+# Subset of the StreamFlow SQLite schema read by the extractor
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflow (
+    id INTEGER PRIMARY KEY, name TEXT, params TEXT, status INTEGER,
+    type TEXT, start_time INTEGER, end_time INTEGER
+);
+CREATE TABLE IF NOT EXISTS step (
+    id INTEGER PRIMARY KEY, name TEXT, workflow INTEGER, status INTEGER,
+    type TEXT, params TEXT
+);
+CREATE TABLE IF NOT EXISTS execution (
+    id INTEGER PRIMARY KEY, step INTEGER, job_token INTEGER, cmd TEXT,
+    status INTEGER, start_time INTEGER, end_time INTEGER
+);
+CREATE TABLE IF NOT EXISTS token (
+    id INTEGER PRIMARY KEY, port INTEGER, tag TEXT, type TEXT, value BLOB
+);
+CREATE TABLE IF NOT EXISTS target (
+    id INTEGER PRIMARY KEY, deployment INTEGER, type TEXT, locations INTEGER,
+    service TEXT, workdir TEXT, params TEXT
+);
+CREATE TABLE IF NOT EXISTS deployment (
+    id INTEGER PRIMARY KEY, name TEXT, type TEXT, config TEXT, external INTEGER,
+    lazy INTEGER, workdir TEXT, wraps TEXT
+);
+"""
+
+
+def connect(database):
+    # Read-only, so that the database of a running workflow is never modified
+    db = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+    db.execute("PRAGMA query_only = ON")
+    return db
+
+
+def select_workflow(db, workflow=None):
+    if workflow is None:
+        row = db.execute(
+            "SELECT id, start_time FROM workflow ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    elif workflow.isdigit():
+        row = db.execute(
+            "SELECT id, start_time FROM workflow WHERE id = ?", (int(workflow),)
+        ).fetchone()
+    else:
+        row = db.execute(
+            "SELECT id, start_time FROM workflow WHERE name = ? ORDER BY id DESC",
+            (workflow,),
+        ).fetchone()
+    if row is None:
+        raise Exception(f"Workflow {workflow or ''} not found in the database")
+    return row
+
+
+def step_locations(db, workflow_id):
+    # Schedule steps persist their binding config as a list of target ids
+    deployments = dict(
+        db.execute(
+            "SELECT target.id, deployment.name FROM target "
+            "JOIN deployment ON target.deployment = deployment.id"
+        )
+    )
+    locations = {}
+    for name, params in db.execute(
+        "SELECT name, params FROM step WHERE workflow = ?", (workflow_id,)
+    ):
+        try:
+            targets = json.loads(params or "{}").get("binding_config", {})["targets"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        if posixpath.basename(name) == "__schedule__":
+            name = posixpath.dirname(name)
+        locations[name] = ",".join(
+            deployments.get(target, str(target)) for target in targets
+        )
+    return locations
+
+
+def job_name(step_name, tag, value):
+    try:
+        value = json.loads(value)
+        return value.get("job", value)["name"]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return posixpath.join(step_name, tag or "0")
+
+
+def extract(database, workflow=None, batch_size=10000, time_unit=10**3):
+    # Timestamps are stored by StreamFlow in nanoseconds (time_unit per microsecond)
+    db = connect(database)
+    try:
+        workflow_id, workflow_start = select_workflow(db, workflow)
+        locations = step_locations(db, workflow_id)
+        cursor = db.execute(
+            "SELECT step.name, token.tag, token.value, execution.status, "
+            "execution.start_time, execution.end_time "
+            "FROM step "
+            "JOIN execution ON execution.step = step.id "
+            "LEFT JOIN token ON execution.job_token = token.id "
+            "WHERE step.workflow = ? "
+            "ORDER BY execution.id",
+            (workflow_id,),
+        )
+        combined = {}
+        while rows := cursor.fetchmany(batch_size):
+            for step_name, tag, value, status, start_time, end_time in rows:
+                if workflow_start is None:
+                    workflow_start = start_time
+                events = combined.setdefault(job_name(step_name, tag, value), [])
+                start = timedelta(
+                    microseconds=(start_time - workflow_start) // time_unit
+                )
+                events.append(
+                    {
+                        "time": start,
+                        "status": "ALLOCATED",
+                        "location": locations.get(step_name, "unknown"),
+                    }
+                )
+                events.append({"time": start, "status": "RUNNING"})
+                if end_time is not None:
+                    event = {
+                        "time": timedelta(
+                            microseconds=(end_time - workflow_start) // time_unit
+                        ),
+                        "status": STATUSES.get(status, str(status)),
+                    }
+                    if event["status"] == "ERROR":
+                        # Executions only fail while running the command
+                        event["error_type"] = "executing"
+                    events.append(event)
+        return combined
+    finally:
+        db.close()
+
+
+def write_fixture(database, jobs=10, failures=3):
+    # Small database with the StreamFlow layout, to exercise the extractor
+    if os.path.exists(database):
+        raise Exception(f"Fixture database {database} already exists")
+    db = sqlite3.connect(database)
+    with db:
+        db.executescript(SCHEMA)
+        db.execute(
+            "INSERT INTO workflow VALUES (1, 'fixture', '{}', 4, 'cwl', 0, NULL)"
+        )
+        db.execute(
+            "INSERT INTO deployment VALUES (1, 'image0', 'docker', '{}', 0, 0, NULL, NULL)"
+        )
+        db.execute("INSERT INTO target VALUES (1, 1, 'target', 1, NULL, NULL, '{}')")
+        db.execute(
+            "INSERT INTO step VALUES (1, '/chromosome/individuals', 1, 4, "
+            "'ExecuteStep', '{}')"
+        )
+        db.execute(
+            "INSERT INTO step VALUES (2, '/chromosome/individuals/__schedule__', 1, 4, "
+            "'ScheduleStep', ?)",
+            (json.dumps({"binding_config": {"targets": [1], "filters": []}}),),
+        )
+        now = 0
+        for i in range(jobs):
+            name = f"/chromosome/individuals/0.{i}"
+            db.execute(
+                "INSERT INTO token VALUES (?, NULL, ?, 'JobToken', ?)",
+                (i + 1, f"0.{i}", json.dumps({"job": {"name": name}})),
+            )
+            for attempt in range(2 if i < failures else 1):
+                db.execute(
+                    "INSERT INTO execution "
+                    "(step, job_token, cmd, status, start_time, end_time) "
+                    "VALUES (1, ?, 'dummyfailure', ?, ?, ?)",
+                    (
+                        i + 1,
+                        5 if attempt == 0 and i < failures else 4,
+                        now,
+                        now + 10**9,
+                    ),
+                )
+                now += 2 * 10**9
+    db.close()
+
+
+def main(args):
+    if args.write_fixture:
+        write_fixture(args.database)
+    combined = extract(args.database, args.workflow, args.batch_size)
+    print(
+        "Number of steps",
+        len(
+            {
+                s
+                for s in combined.keys()
+                if "-injector" not in s and "-collector" not in s
+            }
+        ),
+    )
+    save_timeline(args.output, combined)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract the timeline of a workflow from the StreamFlow database"
+    )
+    parser.add_argument(
+        "database",
+        nargs="?",
+        default=".streamflow/sqlite.db",
+        help="StreamFlow SQLite database",
+    )
+    parser.add_argument(
+        "--workflow", help="Workflow name or id, the most recent one by default"
+    )
+    parser.add_argument(
+        "--output",
+        default="timeline.npz",
+        help=f"Timeline file, the format is chosen by its extension among {FORMATS}",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10000,
+        help="Number of executions fetched from the database at a time",
+    )
+    parser.add_argument(
+        "--write-fixture",
+        action="store_true",
+        help="Create a small fixture database at the given path before extracting",
+    )
+    main(parser.parse_args())
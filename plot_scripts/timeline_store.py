@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+from datetime import timedelta
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Categorical columns and the integer type of their codes, -1 marks a missing value
+CATEGORIES = {
+    "job": "int32",
+    "status": "int8",
+    "location": "int16",
+    "error_type": "int8",
+    "error_message": "int32",
+}
+COLUMNS = ("job", "time", "status", "location", "error_type", "error_message")
+FORMATS = (".json", ".npz", ".parquet")
+MICROSECOND = timedelta(microseconds=1)
+
+
+def serialize_jobs(jobs):
+    return {
+        k: [{v1: str(v2) for v1, v2 in v.items()} for v in values]
+        for k, values in jobs.items()
+    }
+
+
+def str_to_microseconds(time_str):
+    # Inverse of str(timedelta), e.g. "1 day, 2:03:04.500000"
+    days, _, time_str = time_str.rpartition(", ")
+    h, m, s = time_str.split(":")
+    seconds, _, fraction = s.partition(".")
+    return (
+        (((int(days.split()[0]) if days else 0) * 24 + int(h)) * 60 + int(m)) * 60
+        + int(seconds)
+    ) * 10**6 + int(fraction.ljust(6, "0"))
+
+
+def encode(jobs):
+    # Events are stored grouped by job, in the order of the timeline dictionary
+    names = {name: {} for name in CATEGORIES}
+    columns = {name: [] for name in COLUMNS}
+    for job_name, events in jobs.items():
+        code = names["job"].setdefault(job_name, len(names["job"]))
+        for event in events:
+            columns["job"].append(code)
+            if isinstance(event["time"], timedelta):
+                columns["time"].append(event["time"] // MICROSECOND)
+            else:
+                columns["time"].append(str_to_microseconds(event["time"]))
+            for name in ("status", "location", "error_type", "error_message"):
+                if name in event:
+                    value = str(event[name])
+                    columns[name].append(
+                        names[name].setdefault(value, len(names[name]))
+                    )
+                else:
+                    columns[name].append(-1)
+    for name in COLUMNS:
+        columns[name] = np.array(columns[name], dtype=CATEGORIES.get(name, "int64"))
+    return columns, {name: list(values) for name, values in names.items()}
+
+
+class Timeline:
+    def __init__(self, loader, names):
+        self._loader = loader
+        self._columns = {}
+        self.names = names
+
+    def __getitem__(self, column):
+        # Columns are only read from disk the first time they are accessed
+        if column not in self._columns:
+            self._columns[column] = self._loader(column)
+        return self._columns[column]
+
+    def __len__(self):
+        return len(self["time"])
+
+    def labels(self, column):
+        values = np.array(self.names[column] + [None], dtype=object)
+        return values[self[column]]
+
+    def seconds(self):
+        return self["time"] / 10**6
+
+    def jobs(self):
+        # Same structure as the deserialized timeline.json
+        job_names = self.names["job"]
+        optional = [
+            (name, self.names[name], self[name].tolist())
+            for name in ("location", "error_type", "error_message")
+        ]
+        status_names = self.names["status"]
+        jobs = {}
+        for i, (job, time, status) in enumerate(
+            zip(self["job"].tolist(), self["time"].tolist(), self["status"].tolist())
+        ):
+            event = {
+                "time": timedelta(microseconds=time),
+                "status": status_names[status],
+            }
+            for name, values, codes in optional:
+                if codes[i] >= 0:
+                    event[name] = values[codes[i]]
+            jobs.setdefault(job_names[job], []).append(event)
+        return jobs
+
+
+def save_timeline(path, jobs):
+    extension = os.path.splitext(path)[1]
+    if extension == ".json":
+        with open(path, "w") as fd:
+            json.dump(serialize_jobs(jobs), fd, indent=2)
+        return
+    columns, names = encode(jobs)
+    if extension == ".npz":
+        np.savez(
+            path,
+            **columns,
+            **{
+                f"{name}_names": np.array(values, dtype=str)
+                for name, values in names.items()
+            },
+        )
+    elif extension == ".parquet":
+        if pa is None:
+            raise Exception("pyarrow is required to write Parquet timelines")
+        pq.write_table(
+            pa.table(columns, metadata={"names": json.dumps(names)}),
+            path,
+        )
+    else:
+        raise Exception(f"Unknown timeline format {extension}: choose from {FORMATS}")
+
+
+def load_timeline(path):
+    extension = os.path.splitext(path)[1]
+    if extension == ".npz":
+        data = np.load(path)
+        # Columns missing from older files are read as all missing values
+        return Timeline(
+            lambda column: (
+                data[column]
+                if column in data.files
+                else np.full(len(data["time"]), -1, dtype=CATEGORIES[column])
+            ),
+            {
+                name: (
+                    data[f"{name}_names"].tolist()
+                    if f"{name}_names" in data.files
+                    else []
+                )
+                for name in CATEGORIES
+            },
+        )
+    elif extension == ".parquet":
+        if pa is None:
+            raise Exception("pyarrow is required to read Parquet timelines")
+        names = json.loads(pq.read_schema(path).metadata[b"names"])
+        return Timeline(
+            lambda column: pq.read_table(path, columns=[column])
+            .column(column)
+            .to_numpy(),
+            names,
+        )
+    else:
+        with open(path) as fd:
+            columns, names = encode(json.load(fd))
+        return Timeline(columns.__getitem__, names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a timeline between the JSON and columnar formats"
+    )
+    parser.add_argument("source", help="Timeline file")
+    parser.add_argument("destination", help=f"Output file, one of {FORMATS}")
+    args = parser.parse_args()
+    save_timeline(args.destination, load_timeline(args.source).jobs())